@@ -1,191 +1,1178 @@
 from utils import Debugger
-from utils import ImageManager
+from utils import Randomizer
+from utils import get_process_context
 from model import LinearModel
+from model import LogisticModel
+from model import RidgeModel
+from model import LassoModel
 from visualize import Plotter
 from visualize import HistogramSketch
 from visualize import ScatterSketch
+from visualize import SmoothSketch
+from visualize import VerticalLineSketch
 import numpy as np
 import config as g
-from sklearn.metrics import confusion_matrix
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 
 print("Hello you")
 
+def _sim_worker(task):
+  # Runs in a child process, so the relevant config is shipped with the task.
+  method, seed, trials, kwargs, settings = task
+  for name, val in settings.items():
+    setattr(g, name, val)
+  analyzer = Analyzer()
+  return getattr(analyzer, method)(trials=trials, randomizer=Randomizer(seed), **kwargs)
+
+def _cv_worker(task):
+  x_train, y_train, x_test, y_test = task
+  slope, yint, predict = Analyzer().get_logistic_predictor(x_train, y_train)
+  return np.mean((y_test - predict(x_test)) ** 2)
+
+def _fit_worker(task):
+  model_type, x, y = task
+  return Analyzer().fit_single(model_type, x, y)
+
 class Analyzer(object):
   def __init__(self):
     self.debug = Debugger()
   def class_name(self):
     return "Analyzer"
-  def get_confusion_matrix(self, model, threshold):
-    # model --> Model
-    ds = model.get_dataset()
-    y_true = ds.get_output_col()  # --> [5,3,8,1,6,0] = y_true
-    y_pred = []
-    for x in ds.get_input_cols():
-      y_pred.append(model.get_f()(x))
-    #                     f(x)
-    #                           vs.  y
-    tp, tn, fp, fn = []
-    for y_p, y_t in zip(y_pred, y_true):
-      if y_t > threshold:
-        if y_p > threshold:
-          tp += 1
-        else:
-          fn += 1
-      else:
-        if y_p > threshold:
-          fp += 1
-        else:
-          tn += 1
-      return [[tp, fp], [fn, tn]]
-  def get_tp(self, model, threshold):
-      return self.get_confusion_matrix(model, threshold)[0][0]
-  def get_fp(self, model, threshold):
-      return self.get_confusion_matrix(model, threshold)[1][0]
-  def get_fn(self, model, threshold):
-      return self.get_confusion_matrix(model, threshold)[0][1]
-  def get_tn(self, model, threshold):
-      return self.get_confusion_matrix(model, threshold)[1][1]
-  def get_specificity(self, model, threshold):  # Harry
-      # https://en.wikipedia.org/wiki/Sensitivity_and_specificity
-      tn = self.get_tn()
-      fp = self.get_fp()
-      return (tn / (tn + fp))
-  def get_sensitivity(self):  # Harry
-      tp = self.get_tp()
-      fn = self.get_fn()
-      return (tp / (tp + fn))
-  def get_precision(self):  # Harry
-      tp = self.get_tp()
-      fp = self.get_fp()
-      return (tp / (tp + fp))
-  def get_recall(self):  # Harry
-      tp = self.get_tp()
-      fn = self.get_fn()
-      return (tp / (tp + fn))
-  def get_accuracy(self):  # Harry
-      tp = self.get_tp()
-      tn = self.get_tn()
-      fp = self.get_fp()
-      fn = self.get_fn()
-      return ((tp + fn)/(tp + tn + fp + fn))
-  def get_fallout(self):  # Harry
-      fp = self.get_fp()
-      tn = self.get_tn()
-      return (fp/(fp + tn))
+  def get_metrics(self, model, threshold=None, dataset=None):
+    # Metrics on the training data are kept on the model until a refit bumps
+    # its version. A dataset can change under us, so those are not kept.
+    if threshold == None:
+      threshold = g.threshold
+    if dataset == None and model.get_metrics(threshold) != None:
+      self.debug.prn(self, 'Metrics served from cache.', 3)
+      return model.get_metrics(threshold)
+    scored = self.get_scored(model, dataset)
+    if scored == None:
+      return None
+    y_true, y_score = scored
+    metrics = ClassificationMetrics(y_true, y_score, threshold)
+    if dataset == None:
+      model.set_metrics(threshold, metrics)
+    self.debug.prn(self, 'Metrics generated.')
+    return metrics
+  def get_scored(self, model, dataset=None):
+    # Targets and scores for the metrics, or None if either is unavailable.
+    if dataset == None:
+      if model.get_training_x() is None or model.get_training_y() is None:
+        self.debug.prn(self, 'Model has no stored data to score; pass a dataset.', 1)
+        return None
+      x_vals = self._as_array(model.get_training_x())
+      y_true = model.get_targets()
+    else:
+      # get_input_cols is column-major; predict takes rows x features.
+      x_vals = self._as_array(dataset.get_input_cols()).T
+      if x_vals.shape[1] == 1:
+        x_vals = x_vals[:, 0]
+      y_true = self._as_array(dataset.get_output_col())
+    y_score = model.predict(x_vals)
+    if y_score is None:
+      return None
+    return y_true, y_score
+  def get_metric(self, model, threshold, name):
+    metrics = self.get_metrics(model, threshold)
+    if metrics == None:
+      return None
+    return getattr(metrics, name)()
+  def get_confusion_matrix(self, model, threshold=None):
+    return self.get_metric(model, threshold, 'get_confusion_matrix')
+  def get_tp(self, model, threshold=None):
+    return self.get_metric(model, threshold, 'get_tp')
+  def get_fp(self, model, threshold=None):
+    return self.get_metric(model, threshold, 'get_fp')
+  def get_fn(self, model, threshold=None):
+    return self.get_metric(model, threshold, 'get_fn')
+  def get_tn(self, model, threshold=None):
+    return self.get_metric(model, threshold, 'get_tn')
+  def get_specificity(self, model, threshold=None):  # Harry
+    return self.get_metric(model, threshold, 'get_specificity')
+  def get_sensitivity(self, model, threshold=None):  # Harry
+    return self.get_metric(model, threshold, 'get_sensitivity')
+  def get_precision(self, model, threshold=None):  # Harry
+    return self.get_metric(model, threshold, 'get_precision')
+  def get_recall(self, model, threshold=None):  # Harry
+    return self.get_metric(model, threshold, 'get_recall')
+  def get_accuracy(self, model, threshold=None):  # Harry
+    return self.get_metric(model, threshold, 'get_accuracy')
+  def get_fallout(self, model, threshold=None):  # Harry
+    return self.get_metric(model, threshold, 'get_fallout')
   def get_bias(self):  # Harry
        pass
   def get_mean(self):  # Harry
        pass
-  def get_auc(self): # Harry
-    pass
-  def get_p_by_f_dist(self): # Harry
-    pass
+  def get_auc(self, model, threshold=None, dataset=None, bins=None): # Harry
+    roc = self.get_roc(model, threshold, dataset, bins)
+    if roc == None:
+      return None
+    fpr, tpr, thresholds = roc
+    return np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)
+  def get_roc(self, model, threshold=None, dataset=None, bins=None):
+    # Labels come from thresholding y; the curve sweeps every score threshold.
+    if threshold == None:
+      threshold = g.threshold
+    scored = self.get_scored(model, dataset)
+    if scored == None:
+      return None
+    y_true, y_score = scored
+    actual = y_true > threshold
+    y_score = np.broadcast_to(y_score, actual.shape)
+
+    if bins == None:
+      order = np.argsort(-y_score, kind='stable')
+      y_score = y_score[order]
+      actual = actual[order]
+      # Last index of every run of tied scores is one distinct threshold.
+      cuts = np.r_[np.flatnonzero(np.diff(y_score)), len(y_score) - 1]
+      tps = np.cumsum(actual)[cuts]
+      fps = (cuts + 1) - tps
+      thresholds = y_score[cuts]
+    else:
+      # Approximate curve from fixed-size score histograms, O(n + bins).
+      edges = np.linspace(y_score.min(), y_score.max(), bins + 1)
+      pos, edges = np.histogram(y_score[actual], edges)
+      neg, edges = np.histogram(y_score[~actual], edges)
+      tps = np.cumsum(pos[::-1])
+      fps = np.cumsum(neg[::-1])
+      thresholds = edges[-2::-1]
+
+    tps = np.r_[0, tps]
+    fps = np.r_[0, fps]
+    thresholds = np.r_[np.inf, thresholds]
+    if tps[-1] == 0 or fps[-1] == 0:
+      self.debug.prn(self, 'ROC curve needs both positive and negative labels.', 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      fpr = fps / fps[-1]
+      tpr = tps / tps[-1]
+    self.debug.prn(self, f'ROC curve generated over {len(thresholds) - 1} thresholds.')
+    return fpr, tpr, thresholds
+  def get_p_by_f_dist(self, x, y, trials=10000, workers=1, seed=None): # Harry
+    x = self._as_array(x)
+    y = self._as_array(y)
+    f_obs = self.get_f_scores(x[None, :], y[None, :])
+    if len(f_obs) == 0:
+      return np.nan
+    f_null = self.sim_permutation_f_scores(trials, x, y, workers=workers, seed=seed)
+    return np.mean(f_null >= f_obs[0])
+  def _as_array(self, vals):
+    return np.asarray(vals, dtype=np.float64)
   def get_variance(self, model):
-    x_vals = model.get_training_x()
-    x_av = np.mean(x_vals)
-    f = model.get_f()
-    sst = 0
-    for x in x_vals:
-      sst += (x - x_av) ** 2
-    return sst / len(x_vals)
+    if model.get_training_x() is None and model.get_accumulator() != None:
+      return model.get_accumulator().finalize()[3]
+    if not model.has_training_data():
+      return None
+    return self.get_variance_by_parts(model.get_f(), model.get_training_x())
   def get_variance_by_parts(self, f, x_vals):
-    x_av = np.mean(x_vals)
-    sst = 0
-    for x in x_vals:
-      sst += (x - x_av) ** 2
-    return sst / len(x_vals)
+    x_vals = self._as_array(x_vals)
+    return np.mean((x_vals - np.mean(x_vals)) ** 2)
   def get_r_sq(self, model):
-    y_av = np.mean(model.get_training_y())
-    f = model.get_f()
-    ss_res = 0
-    ss_tot = 0
-    for x, y in zip(model.get_training_x(), model.get_training_y()):
-      ss_res += (y - f(x)) ** 2
-      ss_tot += (y - y_av) ** 2
+    if model.get_training_x() is None and model.get_accumulator() != None:
+      return model.get_accumulator().finalize()[2]
+    if not model.has_training_data():
+      return None
+    # Against the targets the model was fitted to, e.g. the range-scaled y
+    # of a logistic model.
+    x_vals = self._as_array(model.get_training_x())
+    y_vals = model.get_targets()
+    ss_res = self.get_ss_res_by_parts(x_vals, y_vals, model.predict)
+    ss_tot = np.sum((y_vals - np.mean(y_vals)) ** 2)
     g.debug.prn(self, 'Variance generated.')
     return 1 - (ss_res / ss_tot)
-  def plot_roc(self):
+  def plot_roc(self, model, threshold=None, dataset=None, bins=None):
+    plotter = self.get_roc_plotter(model, threshold, dataset, bins)
+    if plotter == None:
+      return
+    plotter.save()
+    g.debug.prn(self, 'Drawn Receiver Operating Characteristic Plot')
+  def get_roc_plotter(self, model, threshold=None, dataset=None, bins=None):
+    roc = self.get_roc(model, threshold, dataset, bins)
+    if roc == None:
+      return None
+    fpr, tpr, thresholds = roc
     plotter = Plotter()
     plotter.set_title('Receiver Operating Characteristic')
-    plotter.set_axis_labels('')
-    plotter.set_output_filename() #TODO: Fill filename
-    plotter.close()
-    pass # Save the image as "roc.png"
+    plotter.set_axis_labels('False Positive Rate', 'True Positive Rate')
+    plotter.set_output_filename(g.files['roc'])
+    roc_plot = SmoothSketch()
+    roc_plot.add_x(fpr)
+    roc_plot.add_y(tpr)
+    chance_plot = SmoothSketch()
+    chance_plot.add_x([0, 1])
+    chance_plot.add_y([0, 1])
+    plotter.load([roc_plot, chance_plot])
+    plotter.set_output_height(250)
+    return plotter
   def get_ss_res(self, coords, f):
-    ss = 0
-    for coord in coords:
-      ss += (coord[1] - f(coord[0])) ** 2
-    return ss
-  def ssr_curve(self, x, y, slopes=[0.1, 0.2, 0.3, 0.4, 0.5, 0.75, 1.0, 1.5, 2.0, 2.5, 3.0, 4.0, 5.0, 7.5, 10.0]):
-    ssrs = []
-    for slope in slopes:
-        yint = (np.mean(y) - slope * np.mean(x))
-        ssrs.append(self.get_ss_res(zip(x,y), lambda val : slope * val + yint))
-    image_manager = ImageManager()
+    coords = self._as_array(coords if isinstance(coords, np.ndarray) else list(coords))
+    return self.get_ss_res_by_parts(coords[:, 0], coords[:, 1], f)
+  def get_ss_res_by_parts(self, x_vals, y_vals, f):
+    # f is evaluated once on the whole array, so it must broadcast.
+    x_vals = self._as_array(x_vals)
+    y_vals = self._as_array(y_vals)
+    return np.sum((y_vals - f(x_vals)) ** 2)
+  def get_ssr_by_slope(self, x, y, slopes):
+    # With the intercept pinned to the means, SSR(m) = Syy - 2m*Sxy + m^2*Sxx.
+    x = self._as_array(x)
+    y = self._as_array(y)
+    dx = x - np.mean(x)
+    dy = y - np.mean(y)
+    s_xx = np.dot(dx, dx)
+    s_xy = np.dot(dx, dy)
+    s_yy = np.dot(dy, dy)
+    slopes = self._as_array(slopes)
+    return s_yy - 2 * slopes * s_xy + slopes ** 2 * s_xx
+  def get_ssr_slope_range(self, x, y, points=None):
+    if points == None:
+      points = g.ssr_curve_points
+    x = self._as_array(x)
+    slope, yint = self.least_squares_slope_yint_eqn(x, y)
+    ssr_min = self.get_ssr_by_slope(x, y, [slope])[0]
+    s_xx = np.sum((x - np.mean(x)) ** 2)
+    std_err = np.sqrt(ssr_min / (max(len(x) - 2, 1) * s_xx))
+    span = max(abs(slope), 4 * std_err, np.finfo(float).eps)
+    return np.linspace(slope - span, slope + span, points)
+  def ssr_curve(self, x, y, slopes=None):
+    self.get_ssr_plotter(x, y, slopes).save()
+    g.debug.prn(self, 'Drawn Sum of Squared Residuals Plot')
+  def get_ssr_plotter(self, x, y, slopes=None):
+    if slopes is None:
+      slopes = self.get_ssr_slope_range(x, y)
+    slopes = np.sort(self._as_array(slopes))
+    ssrs = self.get_ssr_by_slope(x, y, slopes)
+    slope_min, yint_min = self.least_squares_slope_yint_eqn(x, y)
+    slope_min = float(slope_min)
+    ssr_min = float(self.get_ssr_by_slope(x, y, [slope_min])[0])
+
     plotter = Plotter()
     plotter.set_title('Sum of Squared Residuals')
     plotter.set_axis_labels('Slope Selected', 'Sum of Squared Residual')
     plotter.set_output_filename(g.files['ls-ssr'])
-    ssr_plot = ScatterSketch()
+    ssr_plot = SmoothSketch()
     ssr_plot.add_x(slopes)
     ssr_plot.add_y(ssrs)
-    plotter.load(ssr_plot)
-    plotter.save()
-    plotter.close()
-    g.debug.prn(self, 'Drawn Sum of Squared Residuals Plot')
-    image_manager.scale(g.files['ls-ssr'], g.files['ls-ssr'], 250)
+    min_plot = ScatterSketch()
+    min_plot.add_x([slope_min])
+    min_plot.add_y([ssr_min])
+    min_line = VerticalLineSketch()
+    min_line.set_x(slope_min)
+    min_line.set_y_min(min(0.0, float(ssrs.min())))
+    min_line.set_y_max(ssr_min)
+    plotter.load([ssr_plot, min_plot, min_line])
+    plotter.set_output_height(250)
+    g.debug.prn(self, f'Sum of squared residuals minimum at slope {slope_min}')
+    return plotter
   def least_squares_slope_yint_eqn(self, x, y):
-    n = len(x)
-    sum_x = sum(x)
-    sum_y = sum(y)
-    sum_xy = sum(map(lambda x,y : x * y, x, y))
-    sum_x_sq = sum(map(lambda x : x ** 2, x))
+    x = self._as_array(x)
+    y = self._as_array(y)
     x_av = np.mean(x)
     y_av = np.mean(y)
+    dx = x - x_av
 
-    slope = (n * sum_xy - sum_x * sum_y) / (n * sum_x_sq - (sum_x ** 2))
+    slope = np.dot(dx, y - y_av) / np.dot(dx, dx)
     yint = y_av - slope * x_av
     return slope, yint
-  def f_dist(self, model_type, trials):
+  def least_squares_by_sums(self, n, sum_x, sum_y, sum_xy, sum_x_sq, sum_y_sq):
+    # Works element-wise, so every argument may be an array of fits.
+    s_xx = sum_x_sq - sum_x ** 2 / n
+    s_yy = sum_y_sq - sum_y ** 2 / n
+    s_xy = sum_xy - sum_x * sum_y / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+      slope = s_xy / s_xx
+      yint = (sum_y - slope * sum_x) / n
+      r_sq = s_xy ** 2 / (s_xx * s_yy)
+    return slope, yint, r_sq
+  def least_squares_batch(self, x, y):
+    # Rows are independent series. A 1-D x is shared by every row of y.
+    x = np.atleast_2d(self._as_array(x))
+    y = np.atleast_2d(self._as_array(y))
+    x, y = np.broadcast_arrays(x, y)
+    x_av = x.mean(axis=1)
+    y_av = y.mean(axis=1)
+    dx = x - x_av[:, None]
+    dy = y - y_av[:, None]
+
+    slopes = np.einsum('ij,ij->i', dx, dy) / np.einsum('ij,ij->i', dx, dx)
+    yints = y_av - slopes * x_av
+    self.debug.prn(self, f'Fitted {len(slopes)} least squares series.')
+    return slopes, yints
+  def theil_sen_slope_yint_eqn(self, x, y, randomizer=None):
+    # Median of the pairwise slopes, found by randomized selection over
+    # slope intervals; the n^2 pairs are never all formed.
+    if randomizer == None:
+      randomizer = g.randomizer
+    x = self._as_array(x)
+    y = self._as_array(y)
+    order = np.lexsort((y, x))
+    x = x[order]
+    y = y[order]
+    n = len(x)
+    ties = np.unique(x, return_counts=True)[1]
+    total = n * (n - 1) // 2 - int(np.sum(ties * (ties - 1) // 2))
+    if total == 0:
+      self.debug.prn(self, 'Theil-Sen slope needs two distinct x values.', 1)
+      return None
+    ranks = [(total - 1) // 2] if total % 2 == 1 else [total // 2 - 1, total // 2]
+    slope = self.theil_sen_select(x, y, ranks, total, randomizer)
+    yint = np.median(y - slope * x)
+    return slope, yint
+  def theil_sen_select(self, x, y, ranks, total, randomizer):
+    # Mean of the slopes at the given (adjacent) ranks. [lo, hi) holds them,
+    # with `below` slopes under lo.
+    n = len(x)
+    budget = 8 * max(n, 1250)
+    # Slopes this close are one tied value; see get_theil_sen_bound.
+    tol = 1e-9 * (1 + np.ptp(y) / np.ptp(x))
+    lo, hi, below = -np.inf, np.inf, 0
+    inside, slopes = self.get_theil_sen_pairs(x, y, lo, hi, budget, n, randomizer)
+    for _ in range(g.theil_sen_max_rounds):
+      if inside <= budget:
+        picks = [k - below for k in ranks]
+        if picks[0] < 0 or picks[-1] >= len(slopes):
+          break
+        return np.mean(np.partition(slopes, picks)[picks])
+      # Cut around the ranks with a margin of four standard deviations of
+      # the sample, so one pass usually leaves O(n^2 / sqrt(n)) pairs.
+      slopes = np.sort(slopes)
+      q = len(slopes)
+      ia = int(np.floor(q * (ranks[0] - below) / inside - 2 * np.sqrt(q)))
+      ib = int(np.ceil(q * (ranks[-1] + 1 - below) / inside + 2 * np.sqrt(q)))
+      tied = slopes[max(ia, 0)] == slopes[min(ib, q - 1)]
+      if tied:
+        # The ranks sit in one run of equal slopes; bracket just that value.
+        a = max(slopes[max(ia, 0)] - tol * (1 + abs(slopes[max(ia, 0)])), lo)
+        b = min(slopes[max(ia, 0)] + tol * (1 + abs(slopes[max(ia, 0)])), hi)
+      else:
+        a = self.get_theil_sen_bound(slopes, ia, lo, side='left')
+        b = self.get_theil_sen_bound(slopes, ib, hi, side='right')
+      under = self.get_theil_sen_pairs(x, y, lo, a, 0, 0, randomizer)[0]
+      count, sample = self.get_theil_sen_pairs(x, y, a, b, budget, n, randomizer)
+      bounds = [lo, a, b, hi]
+      counts = [under, count, max(inside - under - count, 0)]
+      first = np.searchsorted(np.cumsum(counts), ranks[0] - below, side='right')
+      last = np.searchsorted(np.cumsum(counts), ranks[-1] - below, side='right')
+      if first > 2 or last > 2:
+        break
+      if tied and first == 1 and last == 1:
+        return slopes[max(ia, 0)]
+      lo, hi = bounds[first], bounds[last + 1]
+      below += sum(counts[:first])
+      if first == 1 and last == 1:
+        inside, slopes = count, sample
+      else:
+        inside, slopes = self.get_theil_sen_pairs(x, y, lo, hi, budget, n, randomizer)
+      self.debug.prn(self, f'Theil-Sen interval narrowed to {inside} pairs.', 3)
+    # The float orderings disagreed with the counts; settle it exactly.
+    self.debug.prn(self, 'Theil-Sen selection fell back to all pairs.', 3)
+    return self.theil_sen_brute(x, y, ranks, lo, hi)
+  def get_theil_sen_bound(self, slopes, index, limit, side):
+    # A cut halfway between two distinct sampled slopes, so no tied run of
+    # slopes sits on the boundary, where the y - t * x orderings round.
+    if index < 0 or index >= len(slopes):
+      return limit
+    if side == 'left':
+      j = np.searchsorted(slopes, slopes[index], side='left')
+      return limit if j == 0 else (slopes[j - 1] + slopes[j]) / 2
+    j = np.searchsorted(slopes, slopes[index], side='right')
+    return limit if j == len(slopes) else (slopes[j - 1] + slopes[j]) / 2
+  def theil_sen_brute(self, x, y, ranks, lo=-np.inf, hi=np.inf):
+    # Exact O(n^2) selection a row at a time, keeping only slopes in [lo, hi).
+    below = 0
+    kept = []
+    for i in range(len(x) - 1):
+      dx = x[i + 1:] - x[i]
+      dy = y[i + 1:] - y[i]
+      slopes = dy[dx != 0] / dx[dx != 0]
+      below += np.count_nonzero(slopes < lo)
+      kept.append(slopes[(slopes >= lo) & (slopes < hi)])
+    slopes = np.concatenate(kept)
+    picks = [k - below for k in ranks]
+    if picks[0] < 0 or picks[-1] >= len(slopes):
+      return self.theil_sen_brute(x, y, ranks)
+    return np.mean(np.partition(slopes, picks)[picks])
+  def get_theil_sen_pairs(self, x, y, lo, hi, budget, size, randomizer):
+    # x is sorted (ties by y). Taken in order of y - lo * x, the pairs with
+    # slope in [lo, hi) are exactly the strict inversions of y - hi * x.
+    # Returns their count, and all of their slopes when there are at most
+    # `budget` of them, else `size` slopes sampled uniformly among them.
+    n = len(x)
+    arrangement = np.arange(n) if lo == -np.inf else np.lexsort((x, y - lo * x))
+    vals = -x if hi == np.inf else y - hi * x
+    keys = np.unique(vals[arrangement], return_inverse=True)[1].ravel()
+    span = keys.max() + 1
+    pos = np.arange(n)
+    levels = []
+    width = 1
+    while width < n:
+      # Bottom-up merge sort. Stable merging keeps each left half ahead of
+      # its equal right elements, so a right element's merged position
+      # gives how many left elements are not greater than it.
+      start = pos // (2 * width) * (2 * width)
+      merged = np.argsort(keys + start * span, kind='stable')
+      placed = np.empty(n, dtype=np.int64)
+      placed[merged] = pos
+      right = pos - start >= width
+      left_end = np.minimum(start + width, n)
+      counts = (left_end - start - (placed - pos + width))[right]
+      if budget > 0 or size > 0:
+        levels.append((arrangement, pos[right], left_end[right], counts))
+      else:
+        levels.append((None, None, None, counts))
+      keys = keys[merged]
+      arrangement = arrangement[merged]
+      width *= 2
+    count = int(sum(np.sum(level[3]) for level in levels))
+    if count == 0 or (budget == 0 and size == 0):
+      return count, np.empty(0)
+
+    # Every inversion is one (right element, left partner) at some level;
+    # the partners are the last `counts` entries of the sorted left half.
+    per_right = np.concatenate([level[3] for level in levels])
+    bounds = np.cumsum(per_right)
+    if count <= budget:
+      picks = np.arange(count)
+    else:
+      # Sorted, so the lookups below walk the level arrays in order.
+      picks = np.sort(randomizer.rng.integers(0, count, size))
+    owner = np.searchsorted(bounds, picks, side='right')
+    offset = picks - (bounds[owner] - per_right[owner])
+    base = np.cumsum([0] + [n] * (len(levels) - 1))
+    arrangements = np.concatenate([level[0] for level in levels])
+    rights = np.concatenate([level[1] + b for level, b in zip(levels, base)])
+    left_ends = np.concatenate([level[2] + b for level, b in zip(levels, base)])
+    first = arrangements[rights[owner]]
+    second = arrangements[left_ends[owner] - per_right[owner] + offset]
+    return count, (y[first] - y[second]) / (x[first] - x[second])
+  def get_prefix_sums(self, x, y):
+    # Running n, x, y, xy, x^2 and y^2 with a leading zero row, so the sums
+    # over points [i, j) are sums[j] - sums[i].
+    stats = np.stack([np.ones(len(x)), x, y, x * y, x ** 2, y ** 2], axis=1)
+    return np.vstack([np.zeros(6), np.cumsum(stats, axis=0)])
+  def get_segment_ss_res(self, sums, starts, ends):
+    # Least squares SSR over points [starts, ends) in O(1) per segment;
+    # starts and ends broadcast, e.g. a column of ends against a row of starts.
+    # Empty or reversed segments come out as nan.
+    n, sum_x, sum_y, sum_xy, sum_x_sq, sum_y_sq = [sums[ends, i] - sums[starts, i] for i in range(6)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+      inv_n = 1 / n
+      s_xx = sum_x_sq - sum_x * sum_x * inv_n
+      s_xy = sum_xy - sum_x * sum_y * inv_n
+      ss_res = sum_y_sq - sum_y * sum_y * inv_n
+      ss_res -= np.where(s_xx > 0, s_xy * s_xy / s_xx, 0)
+    return np.maximum(ss_res, 0)
+  def segmented_fit(self, x, y, max_segments=None, min_size=None):
+    # Independent least squares lines between breakpoints, chosen by dynamic
+    # programming over the prefix sums; the segment count is picked by BIC.
+    # Up to two segments is O(n). Every layer before the last is O(n^2), so
+    # K segments cost O(K n^2), already seconds for K = 4 at n = 10^4.
+    if max_segments == None:
+      max_segments = g.segmented_max_segments
+    if min_size == None:
+      min_size = g.segmented_min_size
+    x = self._as_array(x)
+    y = self._as_array(y)
+    order = np.argsort(x, kind='stable')
+    x = x[order]
+    y = y[order]
+    n = len(x)
+    if n < min_size or x[0] == x[-1]:
+      self.debug.prn(self, 'Too few distinct points for a segmented fit.', 1)
+      return None
+    # Centered, so the running sums do not cancel on large x such as years.
+    x_av = np.mean(x)
+    y_av = np.mean(y)
+    sums = self.get_prefix_sums(x - x_av, y - y_av)
+
+    # Breakpoints only fall between distinct x values.
+    splits = np.flatnonzero(x[1:] > x[:-1]) + 1
+    ends = np.r_[splits, n]
+    max_segments = max(1, min(max_segments, n // min_size))
+    cost = np.full((max_segments + 1, n + 1), np.inf)
+    back = np.zeros((max_segments + 1, n + 1), dtype=int)
+    firsts = ends[ends >= min_size]
+    cost[1, firsts] = self.get_segment_ss_res(sums, 0, firsts)
+    for k in range(2, max_segments + 1):
+      # The last layer is only needed at n, so a single breakpoint is O(n).
+      targets = ends[ends >= k * min_size] if k < max_segments else np.array([n])
+      starts = splits[splits >= (k - 1) * min_size]
+      # Each layer is O(n^2) pairs, taken as (ends x starts) blocks of about
+      # segmented_block_size entries; only starts before the block's last
+      # admissible one are formed.
+      rows = max(1, g.segmented_block_size // max(len(starts), 1))
+      for first in range(0, len(targets), rows):
+        block = targets[first:first + rows]
+        cols = starts[:np.searchsorted(starts, block[-1] - min_size, side='right')]
+        if len(cols) == 0:
+          continue
+        total = cost[k - 1, cols] + self.get_segment_ss_res(sums, cols[None, :], block[:, None])
+        total[cols[None, :] > block[:, None] - min_size] = np.inf
+        best = np.argmin(total, axis=1)
+        cost[k, block] = total[np.arange(len(block)), best]
+        back[k, block] = cols[best]
+
+    counts = np.arange(1, max_segments + 1)
+    with np.errstate(divide='ignore'):
+      bic = n * np.log(cost[1:, n] / n) + (3 * counts - 1) * np.log(n)
+    segments = int(np.argmin(bic)) + 1
+    bounds = [n]
+    for k in range(segments, 1, -1):
+      bounds.append(back[k, bounds[-1]])
+    bounds = np.array([0] + bounds[::-1])
+
+    slopes, yints, r_sq = self.least_squares_by_sums(*(sums[bounds[1:]] - sums[bounds[:-1]]).T)
+    yints = yints + y_av - slopes * x_av
+    breaks = (x[bounds[1:-1] - 1] + x[bounds[1:-1]]) / 2
+    self.debug.prn(self, f'Segmented fit with {segments} segments generated.')
+    return breaks, np.stack([slopes, yints], axis=1), bic
+  def get_f_scores(self, x_vals, y_vals):
+    # Rows of x_vals and y_vals are independent trials.
+    x_vals = self._as_array(x_vals)
+    y_vals = self._as_array(y_vals)
+    # Parameters of the fitted line (slope, intercept) and of the null model
+    # (the mean).
+    p_fit = 2
+    p_mean = 1
+    n = y_vals.shape[1]
+    if n <= p_fit:
+      self.debug.prn(self, f'F scores need more than {p_fit} points per trial.', 1)
+      return np.empty(0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+      slopes, yints = self.least_squares_batch(x_vals, y_vals)
+      ss_fit = np.sum((y_vals - (slopes[:, None] * x_vals + yints[:, None])) ** 2, axis=1)
+      ss_mean = np.sum((y_vals - y_vals.mean(axis=1, keepdims=True)) ** 2, axis=1)
+      f_scores = ((ss_mean - ss_fit) / (p_fit - p_mean)) / (ss_fit / (n - p_fit))
+    valid = (ss_fit != 0) & np.isfinite(f_scores)
+    if not valid.all():
+      self.debug.prn(self, f'Dropped {np.count_nonzero(~valid)} degenerate trials.', 1)
+    return f_scores[valid]
+  def run_sharded(self, method, trials, workers=1, seed=None, **kwargs):
+    # Worker i always gets the i-th child of seed and the same share of
+    # trials, so the merged result only depends on seed and workers.
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    shares = [trials // workers + (i < trials % workers) for i in range(workers)]
+    settings = {name: getattr(g, name) for name in g.sim_settings}
+    tasks = [(method, s, n, kwargs, settings) for s, n in zip(seeds, shares)]
+    if workers == 1:
+      results = [_sim_worker(tasks[0])]
+    else:
+      with ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context()) as pool:
+        results = list(pool.map(_sim_worker, tasks))
+    self.debug.prn(self, f'Ran {method} on {workers} worker(s).')
+    return np.concatenate(results)
+  def sim_f_scores(self, trials, chunk_size=None, randomizer=None, workers=1, seed=None):
+    if workers > 1 or seed != None:
+      return self.run_sharded('sim_f_scores', trials, workers, seed, chunk_size=chunk_size)
+    if chunk_size == None:
+      chunk_size = g.f_dist_chunk_size
+    if randomizer == None:
+      randomizer = g.randomizer
+    # Only a chunk_size x points_to_gen block of samples is alive at once.
+    f_scores = []
+    done = 0
+    while done < trials:
+      rows = min(chunk_size, trials - done)
+      x_vals = randomizer.random_matrix(rows, g.points_to_gen, g.lower_x_bound, g.upper_x_bound)
+      y_vals = randomizer.random_matrix(rows, g.points_to_gen, g.lower_y_bound, g.upper_y_bound)
+      f_scores.append(self.get_f_scores(x_vals, y_vals))
+      done += rows
+    self.debug.prn(self, f'Simulated {trials} F scores.')
+    return np.concatenate(f_scores) if f_scores else np.empty(0)
+  def sim_permutation_f_scores(self, trials, x, y, chunk_size=None, randomizer=None, workers=1, seed=None):
+    if workers > 1 or seed != None:
+      return self.run_sharded('sim_permutation_f_scores', trials, workers, seed, x=x, y=y, chunk_size=chunk_size)
+    if chunk_size == None:
+      chunk_size = g.f_dist_chunk_size
+    if randomizer == None:
+      randomizer = g.randomizer
+    x = self._as_array(x)
+    y = self._as_array(y)
+    # Null model: y is shuffled against a fixed x in every trial.
+    f_scores = []
+    done = 0
+    while done < trials:
+      rows = min(chunk_size, trials - done)
+      f_scores.append(self.get_f_scores(x, randomizer.permutation_matrix(rows, y)))
+      done += rows
+    self.debug.prn(self, f'Simulated {trials} permutation F scores.')
+    return np.concatenate(f_scores) if f_scores else np.empty(0)
+  def sim_bootstrap(self, trials, x, y, chunk_elements=None, randomizer=None, workers=1, seed=None):
+    if workers > 1 or seed != None:
+      return self.run_sharded('sim_bootstrap', trials, workers, seed, x=x, y=y, chunk_elements=chunk_elements)
+    if chunk_elements == None:
+      chunk_elements = g.bootstrap_chunk_elements
+    if randomizer == None:
+      randomizer = g.randomizer
+    x = self._as_array(x)
+    y = self._as_array(y)
+    n = len(x)
+    # Centering first keeps the raw sums well conditioned.
+    x_av = np.mean(x)
+    y_av = np.mean(y)
+    dx = x - x_av
+    dy = y - y_av
+    point_stats = np.stack([np.ones(n), dx, dy, dx * dy, dx ** 2, dy ** 2], axis=1)
+
+    # Each replicate holds n draws and n counts, so the rows per chunk come
+    # from an element budget; peak memory does not grow with n.
+    chunk_size = max(1, chunk_elements // n)
+    fits = []
+    done = 0
+    while done < trials:
+      rows = min(chunk_size, trials - done)
+      indices = randomizer.random_indices(rows, n)
+      # How often each point was drawn, so one product gives every replicate's sums.
+      offsets = (np.arange(rows) * n)[:, None]
+      counts = np.bincount((indices + offsets).ravel(), minlength=rows * n).reshape(rows, n)
+      sums = counts @ point_stats
+      slope, yint, r_sq = self.least_squares_by_sums(*sums.T)
+      fits.append(np.stack([slope, yint + y_av - slope * x_av, r_sq], axis=1))
+      done += rows
+    self.debug.prn(self, f'Fitted {trials} bootstrap replicates.')
+    return np.concatenate(fits) if fits else np.empty((0, 3))
+  def get_bootstrap_ci(self, x, y, trials=None, percentiles=(2.5, 97.5), workers=1, seed=None):
+    if x is None or y is None:
+      self.debug.prn(self, 'Bootstrap needs the training points; sums alone cannot be resampled.', 1)
+      return None
+    if trials == None:
+      trials = g.bootstrap_trials
+    fits = self.sim_bootstrap(trials, x, y, workers=workers, seed=seed)
+    fits = fits[np.isfinite(fits).all(axis=1)]
+    ci = np.percentile(fits, percentiles, axis=0)
+    g.debug.prn(self, 'Bootstrap confidence intervals generated.')
+    return {
+      'slope': ci[:, 0],
+      'yint': ci[:, 1],
+      'r_sq': ci[:, 2],
+    }
+  def multivariate_least_squares(self, x, y, chunk_size=None):
+    # x is (n, p), y is (n,) or (n, m). Solved by a chunked QR of [x y].
+    if chunk_size == None:
+      chunk_size = g.qr_chunk_size
+    x = self._as_array(x)
+    y = self._as_array(y)
+    if x.ndim == 1:
+      x = x[:, None]
+    single = y.ndim == 1
+    if single:
+      y = y[:, None]
+    n, p = x.shape
+    x_av = x.mean(axis=0)
+    y_av = y.mean(axis=0)
+
+    # R of the stacked chunk Rs is the R of the whole centered [x y] matrix.
+    blocks = []
+    for start in range(0, n, chunk_size):
+      stop = start + chunk_size
+      block = np.hstack([x[start:stop] - x_av, y[start:stop] - y_av])
+      blocks.append(np.linalg.qr(block, mode='r'))
+    r = np.linalg.qr(np.vstack(blocks), mode='r')
+    r_xx = r[:p, :p]
+    r_xy = r[:p, p:]
+    r_yy = r[p:, p:]
+    # Against the raw column sizes: centering cannot undo the rounding a
+    # dependent column picked up at its original magnitude.
+    diag = np.abs(np.diag(r_xx))
+    scale = np.sqrt(np.einsum('ij,ij->j', x, x))
+    if len(diag) < p or (diag <= np.finfo(float).eps * n * scale).any():
+      self.debug.prn(self, 'Input columns are linearly dependent.', 1)
+      return None
+
+    coefs = np.linalg.solve(r_xx, r_xy)
+    yints = y_av - x_av @ coefs
+    ss_res = np.einsum('ij,ij->j', r_yy, r_yy)
+    ss_tot = ss_res + np.einsum('ij,ij->j', r_xy, r_xy)
+    r_sq = 1 - ss_res / ss_tot
+    variance = ss_res / max(n - p - 1, 1)
+    self.debug.prn(self, f'Fitted {y.shape[1]} response(s) on {p} input(s).')
+    if single:
+      return coefs[:, 0], yints[0], r_sq[0], variance[0]
+    return coefs, yints, r_sq, variance
+  def ridge_path(self, x, y, lambdas=None):
+    # Minimizes |y - a - xb|^2 + lambda * |b|^2 for every lambda from one SVD.
+    x = self._as_array(x)
+    y = self._as_array(y)
+    if x.ndim == 1:
+      x = x[:, None]
+    n = len(y)
+    x_av = x.mean(axis=0)
+    y_av = np.mean(y)
+    x_c = x - x_av
+    y_c = y - y_av
+    u, sv, vt = np.linalg.svd(x_c, full_matrices=False)
+    u_y = u.T @ y_c
+    sv_sq = sv ** 2
+    if lambdas is None:
+      lambdas = np.logspace(-6, 2, g.ridge_path_points) * sv_sq.max()
+    lambdas = self._as_array(lambdas)
+
+    # Everything below is O(lambdas * p); the data is not touched again.
+    shrink = sv_sq / (sv_sq + lambdas[:, None])
+    coefs = (shrink / sv * u_y) @ vt
+    yints = y_av - coefs @ x_av
+    ss_res = (np.dot(y_c, y_c) - np.dot(u_y, u_y)) + np.sum(((1 - shrink) * u_y) ** 2, axis=1)
+    dof = shrink.sum(axis=1) + 1
+    gcv = (ss_res / n) / (1 - dof / n) ** 2
+    self.debug.prn(self, f'Ridge path over {len(lambdas)} lambdas generated.')
+    return lambdas, coefs, yints, gcv
+  def lasso_path(self, x, y, lambdas=None, tol=None, max_iter=None):
+    # Minimizes |y - a - xb|^2 / 2n + lambda * |b|_1 along a decreasing path.
+    if tol == None:
+      tol = g.lasso_tol
+    if max_iter == None:
+      max_iter = g.lasso_max_iter
+    x = self._as_array(x)
+    y = self._as_array(y)
+    if x.ndim == 1:
+      x = x[:, None]
+    n, p = x.shape
+    x_av = x.mean(axis=0)
+    y_av = np.mean(y)
+    x_c = x - x_av
+    y_c = y - y_av
+    # Covariance updates: after this the sweeps never touch the n rows.
+    gram = (x_c.T @ x_c) / n
+    cov = (x_c.T @ y_c) / n
+    y_sq = np.dot(y_c, y_c) / n
+    diag = np.diag(gram)
+    if lambdas is None:
+      lambda_max = np.max(np.abs(cov))
+      lambdas = lambda_max * np.logspace(0, -3, g.lasso_path_points)
+    lambdas = np.sort(self._as_array(lambdas))[::-1]
+
+    coefs = np.zeros((len(lambdas), p))
+    b = np.zeros(p)
+    grad = cov.copy()
+    usable = diag > 0
+    prev_lambda = lambdas[0]
+    for k, lam in enumerate(lambdas):
+      # Sequential strong rule; the KKT check below catches any mistakes.
+      strong = usable & ((np.abs(grad) >= 2 * lam - prev_lambda) | (b != 0))
+      while True:
+        active = np.flatnonzero(strong)
+        for sweep in range(max_iter):
+          max_step = 0.0
+          for j in active:
+            rho = grad[j] + diag[j] * b[j]
+            new_b = np.sign(rho) * max(abs(rho) - lam, 0.0) / diag[j]
+            step = new_b - b[j]
+            if step != 0.0:
+              grad -= gram[:, j] * step
+              b[j] = new_b
+              max_step = max(max_step, diag[j] * step ** 2)
+          if max_step < tol * y_sq:
+            break
+        else:
+          self.debug.prn(self, f'Lasso did not converge at lambda {lam}.', 1)
+        violations = usable & ~strong & (np.abs(grad) > lam)
+        if not violations.any():
+          break
+        strong |= violations
+      coefs[k] = b
+      prev_lambda = lam
+
+    yints = y_av - coefs @ x_av
+    ss_res = n * (y_sq - 2 * coefs @ cov + np.einsum('ij,jk,ik->i', coefs, gram, coefs))
+    ss_res = np.maximum(ss_res, np.finfo(float).tiny)
+    dof = np.count_nonzero(coefs, axis=1) + 1
+    bic = n * np.log(ss_res / n) + dof * np.log(n)
+    self.debug.prn(self, f'Lasso path over {len(lambdas)} lambdas generated.')
+    return lambdas, coefs, yints, bic
+  def _get_xy(self, dataset):
+    if isinstance(dataset, DataSet):
+      return self._as_array(dataset.get_input_cols()[0]), self._as_array(dataset.get_output_col())
+    x, y = dataset
+    return self._as_array(x), self._as_array(y)
+  def get_logistic_scale(self, y):
+    # Targets outside [0, 1] are mapped onto it by their range.
+    y = self._as_array(y)
+    if y.min() < 0 or y.max() > 1:
+      return y.min(), y.max() - y.min()
+    return 0.0, 1.0
+  def get_logistic_predictor(self, x, y):
+    # Same fit as Modeller.get_logistic, mapped back onto the range of y.
+    # slope and yint are on the logit scale of the range-scaled targets.
+    offset, span = self.get_logistic_scale(y)
+    slope, yint = self.logistic_irls(x, (self._as_array(y) - offset) / span)
+    def predict(vals):
+      with np.errstate(over='ignore'):
+        return offset + span / (1 + np.exp(-(slope * vals + yint)))
+    return slope, yint, predict
+  def logistic_irls(self, x, y, tol=None, max_iter=None):
+    # Maximum likelihood by Newton steps (IRLS); y may hold fractions in [0, 1].
+    if tol == None:
+      tol = g.logistic_tol
+    if max_iter == None:
+      max_iter = g.logistic_max_iter
+    x = self._as_array(x)
+    y = self._as_array(y)
+    if x.ndim == 1:
+      x = x[:, None]
+    n, p = x.shape
+    x_av = x.mean(axis=0)
+    design = np.hstack([x - x_av, np.ones((n, 1))])
+    b = np.zeros(p + 1)
+    for i in range(max_iter):
+      with np.errstate(over='ignore'):
+        mu = 1 / (1 + np.exp(-(design @ b)))
+      weights = np.maximum(mu * (1 - mu), 1e-12)
+      try:
+        step = np.linalg.solve((design * weights[:, None]).T @ design, design.T @ (y - mu))
+      except np.linalg.LinAlgError:
+        self.debug.prn(self, 'Logistic fit is singular; classes may be separable.', 1)
+        break
+      b += step
+      if np.max(np.abs(step)) < tol:
+        break
+    else:
+      self.debug.prn(self, 'Logistic fit did not converge.', 1)
+    self.debug.prn(self, f'Logistic fit finished after {i + 1} IRLS steps.')
+    # Coefficients on the inputs, then the intercept on the uncentered scale.
+    return np.r_[b[:-1], b[-1] - b[:-1] @ x_av]
+  def logistic_minibatch(self, batches, epochs=None, learning_rate=None):
+    # batches() must return a fresh iterable of (x, y) chunks on every call,
+    # e.g. lambda : dataset.get_chunks(10000).
+    if epochs == None:
+      epochs = g.logistic_epochs
+    if learning_rate == None:
+      learning_rate = g.logistic_learning_rate
+    # One pass for the feature means and spreads so that steps are well scaled.
+    n = 0
+    sum_x = 0
+    sum_x_sq = 0
+    for x_b, y_b in batches():
+      x_b = self._as_array(x_b).reshape(len(y_b), -1)
+      n += len(x_b)
+      sum_x = sum_x + x_b.sum(axis=0)
+      sum_x_sq = sum_x_sq + (x_b ** 2).sum(axis=0)
+    x_av = sum_x / n
+    x_sd = np.sqrt(np.maximum(sum_x_sq / n - x_av ** 2, 0))
+    x_sd[x_sd == 0] = 1
+
+    # Adam on the mean log-loss of each chunk.
+    b = np.zeros(len(x_av) + 1)
+    moment = np.zeros_like(b)
+    second = np.zeros_like(b)
+    beta_1, beta_2, eps = 0.9, 0.999, 1e-8
+    t = 0
+    for epoch in range(epochs):
+      for x_b, y_b in batches():
+        z = (self._as_array(x_b).reshape(len(y_b), -1) - x_av) / x_sd
+        with np.errstate(over='ignore'):
+          mu = 1 / (1 + np.exp(-(z @ b[:-1] + b[-1])))
+        err = mu - self._as_array(y_b)
+        grad = np.r_[z.T @ err, np.sum(err)] / len(err)
+        t += 1
+        moment = beta_1 * moment + (1 - beta_1) * grad
+        second = beta_2 * second + (1 - beta_2) * grad ** 2
+        b -= learning_rate * (moment / (1 - beta_1 ** t)) / (np.sqrt(second / (1 - beta_2 ** t)) + eps)
+    self.debug.prn(self, f'Logistic minibatch fit finished after {t} steps.')
+    slopes = b[:-1] / x_sd
+    return np.r_[slopes, b[-1] - slopes @ x_av]
+  def get_executor(self, executor, workers):
+    if executor == 'thread':
+      return ThreadPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context())
+  def cross_validate(self, model_type, dataset, k=5, penalty=None, workers=1, executor='thread', randomizer=None):
+    # penalty is on the scale of ridge_path (|y - a - xb|^2 + penalty * b^2)
+    # or lasso_path (|y - a - xb|^2 / 2n + penalty * |b|). Left as None, each
+    # training fold picks its own, by GCV or BIC as the fitted models do.
+    x, y = self._get_xy(dataset)
+    n = len(x)
+    if k < 2 or k > n:
+      self.debug.prn(self, f'Cannot split {n} points into {k} folds.', 1)
+      return None
+    if randomizer == None:
+      randomizer = g.randomizer
+    folds = np.empty(n, dtype=int)
+    folds[randomizer.rng.permutation(n)] = np.arange(n) % k
+
+    penalties = None
+    if model_type in [LinearModel, RidgeModel, LassoModel]:
+      errors, penalties = self._cross_validate_by_sums(model_type, x, y, folds, k, penalty)
+    elif model_type == LogisticModel:
+      tasks = [(x[folds != i], y[folds != i], x[folds == i], y[folds == i]) for i in range(k)]
+      with self.get_executor(executor, workers) as pool:
+        errors = np.array(list(pool.map(_cv_worker, tasks)))
+    else:
+      self.debug.prn(self, 'Incompatible model type.', 1)
+      return None
+    self.debug.prn(self, f'{k}-fold cross validation finished.')
+    return {
+      'errors': errors,
+      'mean_error': np.mean(errors),
+      'penalties': penalties,
+    }
+  def _cross_validate_by_sums(self, model_type, x, y, folds, k, penalty):
+    # Per-fold sums are taken once; each training set is total minus fold.
+    dx = x - np.mean(x)
+    dy = y - np.mean(y)
+    point_stats = [np.ones(len(x)), dx, dy, dx * dy, dx ** 2, dy ** 2]
+    fold_sums = np.stack([np.bincount(folds, weights=col, minlength=k) for col in point_stats], axis=1)
+    train_sums = fold_sums.sum(axis=0) - fold_sums
+
+    n, sum_x, sum_y, sum_xy, sum_x_sq, sum_y_sq = train_sums.T
+    s_xx = sum_x_sq - sum_x ** 2 / n
+    s_xy = sum_xy - sum_x * sum_y / n
+    s_yy = sum_y_sq - sum_y ** 2 / n
+    if model_type in [RidgeModel, LassoModel]:
+      if penalty == None:
+        penalty = self.get_fold_penalties(model_type, n, s_xx, s_xy, s_yy)
+      else:
+        penalty = np.full(k, float(penalty))
+    if model_type == RidgeModel:
+      slope = s_xy / (s_xx + penalty)
+    elif model_type == LassoModel:
+      slope = np.sign(s_xy) * np.maximum(np.abs(s_xy) - n * penalty, 0) / s_xx
+    else:
+      slope = s_xy / s_xx
+    yint = (sum_y - slope * sum_x) / n
+
+    # Held-out squared error expanded in terms of the fold's own sums.
+    n, sum_x, sum_y, sum_xy, sum_x_sq, sum_y_sq = fold_sums.T
+    ss_res = (sum_y_sq - 2 * slope * sum_xy - 2 * yint * sum_y + slope ** 2 * sum_x_sq
+              + 2 * slope * yint * sum_x + yint ** 2 * n)
+    return ss_res / n, penalty
+  def get_fold_penalties(self, model_type, n, s_xx, s_xy, s_yy):
+    # The 1-D ridge_path / lasso_path selection, one row per training fold,
+    # over the same lambda grids, from the centered sums alone.
+    n = n[:, None]
+    s_xx = s_xx[:, None]
+    s_xy = s_xy[:, None]
+    s_yy = s_yy[:, None]
+    if model_type == RidgeModel:
+      lambdas = np.logspace(-6, 2, g.ridge_path_points) * s_xx
+      shrink = s_xx / (s_xx + lambdas)
+      ss_res = s_yy - s_xy ** 2 / s_xx * (1 - (1 - shrink) ** 2)
+      score = (ss_res / n) / (1 - (shrink + 1) / n) ** 2
+    else:
+      lambdas = np.abs(s_xy) / n * np.logspace(0, -3, g.lasso_path_points)
+      slope = np.sign(s_xy) * np.maximum(np.abs(s_xy) - n * lambdas, 0) / s_xx
+      ss_res = np.maximum(s_yy - 2 * slope * s_xy + slope ** 2 * s_xx, np.finfo(float).tiny)
+      score = n * np.log(ss_res / n) + ((slope != 0) + 1) * np.log(n)
+    return lambdas[np.arange(len(lambdas)), np.argmin(score, axis=1)]
+  def fit_batch(self, jobs, workers=1, executor='thread'):
+    # Jobs are (model type, x, y). One row per job, in job order.
+    rows = {}
+    groups = {}
+    tasks = []
+    for i, (model_type, x, y) in enumerate(jobs):
+      x = self._as_array(x)
+      y = self._as_array(y)
+      if model_type == LinearModel:
+        groups.setdefault(len(x), []).append((i, x, y))
+      elif model_type in [RidgeModel, LassoModel, LogisticModel]:
+        tasks.append((i, (model_type, x, y)))
+      else:
+        self.debug.prn(self, f'Incompatible model type for job {i}.', 1)
+
+    # Least squares series of equal length are fitted as one stack.
+    for n, group in groups.items():
+      x = np.stack([job[1] for job in group])
+      y = np.stack([job[2] for job in group])
+      with np.errstate(divide='ignore', invalid='ignore'):
+        slopes, yints = self.least_squares_batch(x, y)
+        r_sq, mse = self.get_fit_metrics(y, slopes[:, None] * x + yints[:, None])
+      for j, (i, _, _) in enumerate(group):
+        rows[i] = ('LinearModel', n, slopes[j], yints[j], np.nan, r_sq[j], mse[j])
+
+    if len(tasks) > 0:
+      with self.get_executor(executor, workers) as pool:
+        for (i, _), row in zip(tasks, pool.map(_fit_worker, [task for _, task in tasks])):
+          rows[i] = row
+
+    order = sorted(rows)
+    results = pd.DataFrame([rows[i] for i in order], index=order,
+                           columns=['model', 'n', 'slope', 'yint', 'lambda', 'r_sq', 'mse'])
+    results['model'] = results['model'].astype('category')
+    self.debug.prn(self, f'Fitted {len(results)} of {len(jobs)} batch jobs.')
+    return results
+  def fit_single(self, model_type, x, y):
+    if model_type == RidgeModel:
+      lambdas, coefs, yints, gcv = self.ridge_path(x, y)
+      best = np.argmin(gcv)
+      slope, yint, penalty = coefs[best, 0], yints[best], lambdas[best]
+      pred = slope * x + yint
+    elif model_type == LassoModel:
+      lambdas, coefs, yints, bic = self.lasso_path(x, y)
+      best = np.argmin(bic)
+      slope, yint, penalty = coefs[best, 0], yints[best], lambdas[best]
+      pred = slope * x + yint
+    else:
+      slope, yint, predict = self.get_logistic_predictor(x, y)
+      penalty = np.nan
+      pred = predict(x)
+    r_sq, mse = self.get_fit_metrics(y, pred)
+    return (model_type.__name__, len(x), slope, yint, penalty, r_sq, mse)
+  def get_fit_metrics(self, y, pred):
+    # Along the last axis, so stacked series are scored together.
+    ss_res = np.sum((y - pred) ** 2, axis=-1)
+    ss_tot = np.sum((y - np.mean(y, axis=-1, keepdims=True)) ** 2, axis=-1)
+    return 1 - ss_res / ss_tot, ss_res / y.shape[-1]
+  def f_dist(self, model_type, trials, vectorized=False, chunk_size=None, workers=1, seed=None):
+    self.get_f_dist_plotter(model_type, trials, vectorized, chunk_size, workers, seed).save()
+    self.debug.prn(self, 'F distribution created.')
+  def get_f_dist_plotter(self, model_type, trials, vectorized=False, chunk_size=None, workers=1, seed=None):
     plotter = Plotter()
-    image_manager = ImageManager()
 
     plotter.set_title('F Distribution')
     plotter.set_axis_labels('Frequency', 'F Score')
     plotter.set_output_filename(g.files['least-squares-f'])
 
     histogram = HistogramSketch()
-    for i in range(trials):
-      x_vals = g.randomizer.random_list(g.points_to_gen, g.lower_x_bound, g.upper_x_bound)
-      y_vals = g.randomizer.random_list(g.points_to_gen, g.lower_y_bound, g.upper_y_bound)
-
+    if vectorized or workers > 1:
       if model_type == LinearModel:
-        slope, yint = self.least_squares_slope_yint_eqn(x_vals, y_vals)
-        func = lambda x : slope * x + yint
+        histogram.add_x(self.sim_f_scores(trials, chunk_size, workers=workers, seed=seed))
       else:
         g.debug.prn(self, 'Incompatible model type.', 1)
-        break
+    else:
+      for i in range(trials):
+        x_vals = g.randomizer.random_list(g.points_to_gen, g.lower_x_bound, g.upper_x_bound)
+        y_vals = g.randomizer.random_list(g.points_to_gen, g.lower_y_bound, g.upper_y_bound)
 
-      ss_fit = self.get_ss_res(zip(x_vals, y_vals), func)
-      ss_mean = self.get_ss_res(zip(x_vals, y_vals), lambda x : np.mean(x_vals))
-      p_fit = 2 # TODO: Update for Dataframe
-      p_mean = 1 # ""
-      n = len(x_vals)
+        if model_type == LinearModel:
+          slope, yint = self.least_squares_slope_yint_eqn(x_vals, y_vals)
+          func = lambda x : slope * x + yint
+        else:
+          g.debug.prn(self, 'Incompatible model type.', 1)
+          break
 
-      if ss_fit == 0 or (n - p_fit) == 0 or (p_fit - p_mean) == 0:
-        self.debug.prn(self, 'F distribution cannot divide by zero.', 1)
-        continue
-      numerator = (ss_mean - ss_fit) / (p_fit - p_mean)
-      denominator = ss_fit / (n - p_fit)
+        y_av = np.mean(y_vals)
+        ss_fit = self.get_ss_res_by_parts(x_vals, y_vals, func)
+        ss_mean = self.get_ss_res_by_parts(x_vals, y_vals, lambda x : y_av)
+        p_fit = 2 # TODO: Update for Dataframe
+        p_mean = 1 # ""
+        n = len(x_vals)
 
-      histogram.add_x(numerator / denominator)
-      histogram.set_bins()
+        if ss_fit == 0 or (n - p_fit) == 0 or (p_fit - p_mean) == 0:
+          self.debug.prn(self, 'F distribution cannot divide by zero.', 1)
+          continue
+        numerator = (ss_mean - ss_fit) / (p_fit - p_mean)
+        denominator = ss_fit / (n - p_fit)
+
+        histogram.add_x(numerator / denominator)
+    histogram.set_bins()
 
     plotter.load(histogram)
-    plotter.save()
-    plotter.close()
-    image_manager.scale(g.files['least-squares-f'], g.files['least-squares-f'], 250)
-    self.debug.prn(self, 'F distribution created.')
+    plotter.set_output_height(250)
+    return plotter
+
+class LeastSquaresAccumulator(object):
+  def __init__(self):
+    self.debug = Debugger()
+    # Welford/Chan form: means plus centered sums, which stay accurate
+    # when x is large relative to its spread (e.g. years).
+    self.n = 0
+    self.x_av = 0.0
+    self.y_av = 0.0
+    self.s_xx = 0.0
+    self.s_yy = 0.0
+    self.s_xy = 0.0
+  def class_name(self):
+    return "LeastSquaresAccumulator"
+  def update(self, batch):
+    if isinstance(batch, np.ndarray):
+      x, y = batch[:, 0], batch[:, 1]
+    else:
+      x, y = batch
+    x = np.asarray(x, dtype=np.float64).ravel()
+    y = np.asarray(y, dtype=np.float64).ravel()
+    if len(x) == 0:
+      return self
+    x_av = np.mean(x)
+    y_av = np.mean(y)
+    dx = x - x_av
+    dy = y - y_av
+    self._combine(len(x), x_av, y_av, np.dot(dx, dx), np.dot(dy, dy), np.dot(dx, dy))
+    self.debug.prn(self, f'Accumulated {len(x)} points.', 3)
+    return self
+  def merge(self, other):
+    self._combine(other.n, other.x_av, other.y_av, other.s_xx, other.s_yy, other.s_xy)
+    self.debug.prn(self, 'Merged accumulator.', 3)
+    return self
+  def _combine(self, n, x_av, y_av, s_xx, s_yy, s_xy):
+    if n == 0:
+      return
+    total = self.n + n
+    dx = x_av - self.x_av
+    dy = y_av - self.y_av
+    weight = self.n * n / total
+    self.s_xx += s_xx + dx * dx * weight
+    self.s_yy += s_yy + dy * dy * weight
+    self.s_xy += s_xy + dx * dy * weight
+    self.x_av += dx * n / total
+    self.y_av += dy * n / total
+    self.n = total
+  def get_n(self):
+    return self.n
+  def get_sums(self):
+    # n, sum x, sum y, sum xy, sum x^2, sum y^2
+    n = self.n
+    return (n,
+            n * self.x_av,
+            n * self.y_av,
+            self.s_xy + n * self.x_av * self.y_av,
+            self.s_xx + n * self.x_av ** 2,
+            self.s_yy + n * self.y_av ** 2)
+  def finalize(self):
+    if self.n < 2 or self.s_xx == 0:
+      self.debug.prn(self, 'Not enough distinct x values to fit.', 1)
+      return np.nan, np.nan, np.nan, np.nan
+    slope = self.s_xy / self.s_xx
+    yint = self.y_av - slope * self.x_av
+    ss_res = self.s_yy - slope * self.s_xy
+    r_sq = 1 - (ss_res / self.s_yy)
+    variance = self.s_xx / self.n
+    return slope, yint, r_sq, variance
+
+class ClassificationMetrics(object):
+  def __init__(self, y_true, y_score, threshold):
+    self.debug = Debugger()
+    self.threshold = threshold
+    # Both sides are thresholded once; every metric is derived from the counts.
+    actual = np.asarray(y_true, dtype=np.float64) > threshold
+    predicted = np.asarray(y_score, dtype=np.float64) > threshold
+    self.tp = int(np.count_nonzero(actual & predicted))
+    self.fp = int(np.count_nonzero(~actual & predicted))
+    self.fn = int(np.count_nonzero(actual & ~predicted))
+    self.tn = int(np.count_nonzero(~actual & ~predicted))
+    self.debug.prn(self, 'ClassificationMetrics object created.')
+  def class_name(self):
+    return "ClassificationMetrics"
+  def _ratio(self, num, den):
+    if den == 0:
+      self.debug.prn(self, 'Metric is undefined for these counts.', 1)
+      return np.nan
+    return num / den
+  def get_threshold(self):
+    return self.threshold
+  def get_confusion_matrix(self):
+    return [[self.tp, self.fp], [self.fn, self.tn]]
+  def get_tp(self):
+    return self.tp
+  def get_fp(self):
+    return self.fp
+  def get_fn(self):
+    return self.fn
+  def get_tn(self):
+    return self.tn
+  def get_specificity(self):
+    # https://en.wikipedia.org/wiki/Sensitivity_and_specificity
+    return self._ratio(self.tn, self.tn + self.fp)
+  def get_sensitivity(self):
+    return self._ratio(self.tp, self.tp + self.fn)
+  def get_precision(self):
+    return self._ratio(self.tp, self.tp + self.fp)
+  def get_recall(self):
+    return self.get_sensitivity()
+  def get_accuracy(self):
+    return self._ratio(self.tp + self.tn, self.tp + self.tn + self.fp + self.fn)
+  def get_fallout(self):
+    return self._ratio(self.fp, self.fp + self.tn)
 
 class DataSet(object):
   def __init__(self, data):
@@ -221,11 +1208,33 @@ class DataSet(object):
       g.debug.prn(self, "Got list of rows")
     return lst
   def get_input_cols(self): # dependant variables
-    self.get_cols(self.get_label()[:-1])
     g.debug.prn(self, "Importing dependant variables.")
+    return self.get_cols(self.get_label()[:-1])
   def get_output_col(self): # independant variables
-    self.get_cols(self.get_label()[-1])
     g.debug.prn(self, "Importing independant variables.")
+    return self.get_cols(self.get_label()[-1])
+  def get_chunks(self, size, output_cols=None):
+    if output_cols == None:
+      output_cols = self.get_label()[-1:]
+    input_cols = [col for col in self.get_label() if col not in output_cols]
+    for start in range(0, len(self.data), size):
+      chunk = self.data.iloc[start:start + size]
+      yield chunk[input_cols].to_numpy(dtype=np.float64), chunk[output_cols[0]].to_numpy(dtype=np.float64)
+    g.debug.prn(self, "Iterated over chunks.")
+  def get_array(self, col_names):
+    # Contiguous float64 (rows x cols) without going through Python lists.
+    if type(col_names) != list:
+      col_names = [col_names]
+    g.debug.prn(self, "Got column array.")
+    return np.ascontiguousarray(self.data[col_names].to_numpy(dtype=np.float64))
+  def get_input_array(self, output_cols=None):
+    if output_cols == None:
+      output_cols = self.get_label()[-1:]
+    return self.get_array([col for col in self.get_label() if col not in output_cols])
+  def get_output_array(self, output_cols=None):
+    if output_cols == None:
+      output_cols = self.get_label()[-1:]
+    return self.get_array(output_cols)
   def get_label(self):
     g.debug.prn(self, "Returning labels.")
     return list(self.data)
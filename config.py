@@ -1,6 +1,9 @@
+import os
+
 x = []
 y = []
 sketch_sets = {}
+rendered = {}
 debug_level = 2
 x_clr = 'k'
 y_clr = 'k'
@@ -13,6 +16,55 @@ upper_y_bound = 100
 lower_x_bound = 0
 lower_y_bound = 0
 points_to_gen = 25
+f_dist_chunk_size = 10000
+sim_workers = 1
+render_workers = os.cpu_count() or 1
+bootstrap_trials = 10000
+bootstrap_chunk_elements = 2 ** 22
+ssr_curve_points = 1000
+smooth_max_points = 4000
+scatter_max_points = 20000
+hexbin_gridsize = 60
+qr_chunk_size = 50000
+ridge_path_points = 100
+lasso_path_points = 100
+lasso_tol = 1e-7
+lasso_max_iter = 1000
+logistic_tol = 1e-8
+logistic_max_iter = 100
+logistic_epochs = 20
+logistic_learning_rate = 0.05
+threshold = 0.5
+theil_sen_max_rounds = 20
+# One breakpoint is an O(n) scan; each further segment adds an O(n^2) DP layer.
+segmented_max_segments = 2
+segmented_min_size = 10
+segmented_block_size = 2 ** 20
+model_cache_size = 32
+model_cache_folder = 'cache/models'
+model_cache_bytes = 16 * 1024 * 1024
+render_cache = None
+render_cache_bytes = 64 * 1024 * 1024
+render_cache_folder = 'cache/renders'
+sim_settings = [
+  'debug_level',
+  'points_to_gen',
+  'lower_x_bound',
+  'upper_x_bound',
+  'lower_y_bound',
+  'upper_y_bound',
+  'f_dist_chunk_size',
+  'bootstrap_chunk_elements',
+]
+# Read by Plotter.render, shipped to render workers for spawned children.
+render_settings = [
+  'debug_level',
+  'x_clr',
+  'y_clr',
+  'smooth_max_points',
+  'scatter_max_points',
+  'hexbin_gridsize',
+]
 randomizer = None
 debug = None
 console = None
@@ -37,6 +89,10 @@ visuals = {
   'Least Squares - Sum of Squared Residuals': 'ls-ssr',
   'Logistic - Regression': 'lo-reg',
   'Ridge - Regression': 'ri-reg',
+  'Lasso - Regression': 'la-reg',
+  'Theil-Sen - Regression': 'ts-reg',
+  'Segmented - Regression': 'sg-reg',
+  'Receiver Operating Characteristic': 'roc',
 }
 graph_titles = {
   'main': 'Main Graph',
@@ -48,12 +104,24 @@ files = {
   'ls-ssr': 'imgs/ls-ssr.png',
   'logistic-regression': "imgs/lo-reg.png",
   'ridge-regression': 'imgs/ri-reg.png',
+  'lasso-regression': 'imgs/la-reg.png',
+  'theil-sen-regression': 'imgs/ts-reg.png',
+  'segmented-regression': 'imgs/sg-reg.png',
+  'roc': 'imgs/roc.png',
 }
 stats_to_codes = {
   'Least Squares - Slope': 'ls-a',
   'Least Squares - Y-Intercept': 'ls-b',
+  'Least Squares - Slope 95% CI': 'ls-aci',
+  'Least Squares - Y-Intercept 95% CI': 'ls-bci',
   'Least Squares - R Squared': 'ls-rsq',
   'Least Squares - Variance': 'ls-var',
+  'Theil-Sen - Slope': 'ts-a',
+  'Theil-Sen - Y-Intercept': 'ts-b',
+  'Theil-Sen - R Squared': 'ts-rsq',
+  'Segmented - Breakpoints': 'sg-bp',
+  'Segmented - R Squared': 'sg-rsq',
   'Logistic - R Squared': 'lo-rsq',
   'Logistic - Variance': 'lo-var',
+  'Logistic - Area Under Curve': 'auc',
 }
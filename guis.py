@@ -1,5 +1,6 @@
 import PySimpleGUI as sg
 from model import LinearModel
+from visualize import save_all
 from maps import MillerCylindricalProjection
 from maps import OrthographicProjection
 from maps import PolarAzimuthalEquidistantProjection
@@ -427,6 +428,33 @@ class Console(object):
   def clear(self):
     clear_console = lambda: os.system('cls')
     clear_console()
+  def get_visual(self, body):
+    # Returns (plotter, model) for a visual code without rendering it. The
+    # plotter is None when there is nothing new to draw.
+    if body == 'ls-f':
+      return g.analyzer.get_f_dist_plotter(LinearModel, 100, vectorized=True, workers=g.sim_workers), None
+    elif body == 'ls-ssr':
+      return g.analyzer.get_ssr_plotter(g.x, g.y), None
+    elif body == 'roc':
+      if len(g.modeller.logistic_models) == 0:
+        g.debug.prn(self, 'Logistic model has not been generated.', 1)
+        return None, None
+      return g.analyzer.get_roc_plotter(g.modeller.logistic(0)), None
+    fits = {
+      'ls-reg': g.modeller.gen_least_squares,
+      'lo-reg': g.modeller.get_logistic,
+      'ri-reg': g.modeller.get_ridge,
+      'la-reg': g.modeller.get_lasso,
+      'ts-reg': g.modeller.gen_theil_sen,
+      'sg-reg': g.modeller.gen_segmented,
+    }
+    if not body in fits:
+      g.debug.prn(self, f'Visual {body} not recognized.', 1)
+      return None, None
+    model = fits[body](g.x, g.y)
+    if model == None or model.is_exported():
+      return None, model
+    return model.get_plotter(), model
   def read(self, command):
     if command.count(':') == 1:
       header = command.split(':')[0]
@@ -454,20 +482,41 @@ class Console(object):
           g.debug.prn(self, 'File does not exist.', 1)
       elif header == 'g':
         if body == 'ls-f':
-          g.analyzer.f_dist(LinearModel, 100)
+          g.analyzer.f_dist(LinearModel, 100, vectorized=True, workers=g.sim_workers)
           g.debug.prn(self, 'Generated least squares f-distribution.')
         elif body == 'ls-reg':
-          g.modeller.gen_least_squares(g.x,g.y)
+          g.modeller.gen_least_squares(g.x,g.y).export()
           g.debug.prn(self, 'Generated least squares regression.')
         elif body == 'ls-ssr':
           g.analyzer.ssr_curve(g.x, g.y)
           g.debug.prn(self, 'Generated least squares S.S. residuals.')
         elif body == 'lo-reg':
-          g.modeller.get_logistic(g.x, g.y)
+          g.modeller.get_logistic(g.x, g.y).export()
           g.debug.prn(self, 'Generated logistic regression.')
         elif body == 'ri-reg':
-          g.modeller.get_ridge(g.x, g.y)
+          g.modeller.get_ridge(g.x, g.y).export()
           g.debug.prn(self, 'Generated ridge regression.')
+        elif body == 'la-reg':
+          g.modeller.get_lasso(g.x, g.y).export()
+          g.debug.prn(self, 'Generated lasso regression.')
+        elif body == 'ts-reg':
+          model = g.modeller.gen_theil_sen(g.x, g.y)
+          if model == None:
+            return
+          model.export()
+          g.debug.prn(self, 'Generated Theil-Sen regression.')
+        elif body == 'sg-reg':
+          model = g.modeller.gen_segmented(g.x, g.y)
+          if model == None:
+            return
+          model.export()
+          g.debug.prn(self, 'Generated segmented regression.')
+        elif body == 'roc':
+          if len(g.modeller.logistic_models) == 0:
+            g.debug.prn(self, 'Logistic model has not been generated.', 1)
+            return
+          g.analyzer.plot_roc(g.modeller.logistic(0))
+          g.debug.prn(self, 'Generated receiver operating characteristic.')
         elif body == 'map-mill':
           g.mapper.default(MillerCylindricalProjection())
           g.debug.prn(self, 'Generated Miller cylindrical map.')
@@ -490,9 +539,19 @@ class Console(object):
           else:
             g.debug.prn(self, 'Map type not recognized.', 1)
         elif body == 'g':
+          # Fitting stays here; only the rendering is fanned out.
+          plotters = []
+          models = []
           for v in g.visuals.values():
             if not v == 'p':
-              self.read(f'g:{v}')
+              plotter, model = self.get_visual(v)
+              if plotter != None:
+                plotters.append(plotter)
+                if model != None:
+                  models.append(model)
+          save_all(plotters, g.render_workers)
+          for model in models:
+            model.set_exported()
           g.debug.prn(self, 'All visuals generated.')
         else:
           g.debug.prn(self, 'File to generate not recognized.')
@@ -506,59 +565,105 @@ class Console(object):
       elif header == 'v':
         text = ''
         if body == 'ls-a':
-          if os.path.exists(g.files['least-squares']):
+          if len(g.modeller.linear_models) > 0:
             text = f'slope = {g.modeller.linear(0).get_slope()}'
           else:
             g.debug.prn(self,'Least Squares model has not been generated.', 1)
             return
         elif body == 'ls-b':
-          if os.path.exists(g.files['least-squares']):
+          if len(g.modeller.linear_models) > 0:
             text = f'yint = {g.modeller.linear(0).get_yint()}'
           else:
             g.debug.prn(self, 'Least Squares model has not been generated.', 1)
             return
+        elif body == 'ls-aci' or body == 'ls-bci':
+          if len(g.modeller.linear_models) > 0:
+            model = g.modeller.linear(0)
+            ci = g.analyzer.get_bootstrap_ci(model.get_training_x(), model.get_training_y(), workers=g.sim_workers)
+            if ci == None:
+              return
+            if body == 'ls-aci':
+              text = f'slope 95% CI = [{ci["slope"][0]}, {ci["slope"][1]}]'
+            else:
+              text = f'yint 95% CI = [{ci["yint"][0]}, {ci["yint"][1]}]'
+          else:
+            g.debug.prn(self, 'Least Squares model has not been generated.', 1)
+            return
         elif body == 'ls-rsq':
-          if os.path.exists(g.files['least-squares']):
+          if len(g.modeller.linear_models) > 0:
             text = f'R^2 = {g.analyzer.get_r_sq(g.modeller.linear(0))}'
           else:
             g.debug.prn(self, 'Least Squares model has not been generated.', 1)
             return
         elif body == 'ls-var':
-          if os.path.exists(g.files['least-squares']):
+          if len(g.modeller.linear_models) > 0:
             text = f'variance = {g.analyzer.get_variance(g.modeller.linear(0))}'
           else:
             g.debug.prn(self, 'Least Squares model has not been generated.', 1)
             return
+        elif body in ['ts-a', 'ts-b', 'ts-rsq']:
+          if len(g.modeller.theil_sen_models) == 0:
+            g.debug.prn(self, 'Theil-Sen model has not been generated.', 1)
+            return
+          model = g.modeller.theil_sen(0)
+          if body == 'ts-a':
+            text = f'slope = {model.get_slope()}'
+          elif body == 'ts-b':
+            text = f'yint = {model.get_yint()}'
+          else:
+            text = f'R^2 = {g.analyzer.get_r_sq(model)}'
+        elif body in ['sg-bp', 'sg-rsq']:
+          if len(g.modeller.segmented_models) == 0:
+            g.debug.prn(self, 'Segmented model has not been generated.', 1)
+            return
+          model = g.modeller.segmented(0)
+          if body == 'sg-bp':
+            text = f'breakpoints = {model.get_breaks().tolist()}'
+          else:
+            text = f'R^2 = {g.analyzer.get_r_sq(model)}'
         elif body == 'lo-rsq':
-          if os.path.exists(g.files['logistic-regression']):
+          if len(g.modeller.logistic_models) > 0:
             text = f'R^2 = {g.analyzer.get_r_sq(g.modeller.logistic(0))}'
           else:
             g.debug.prn(self, 'Logistic model has not been generated.', 1)
             return
         elif body == 'lo-var':
-          if os.path.exists(g.files['logistic-regression']):
+          if len(g.modeller.logistic_models) > 0:
             text = f'variance = {g.analyzer.get_variance(g.modeller.logistic(0))}'
           else:
             g.debug.prn(self, 'Logistic model has not been generated.', 1)
             return
-        elif body == 'specif':
-          text = f'specificity = {g.analyzer.get_specificity()}'
-        elif body == 'sensit':
-          text = f'sensitivity = {g.analyzer.get_sensitivity()}'
-        elif body == 'precis':
-          text = f'precision = {g.analyzer.get_precision()}'
-        elif body == 'acc':
-          text = f'accuracy = {g.analyzer.get_accuracy()}'
-        elif body == 'recall':
-          text = f'recall = {g.analyzer.get_recall()}'
-        elif body == 'fout':
-          text = f'fallout = {g.analyzer.get_fallout()}'
+        elif body in ['specif', 'sensit', 'precis', 'acc', 'recall', 'fout', 'cm']:
+          if len(g.modeller.logistic_models) == 0:
+            g.debug.prn(self, 'Logistic model has not been generated.', 1)
+            return
+          metrics = g.analyzer.get_metrics(g.modeller.logistic(0))
+          if metrics == None:
+            return
+          if body == 'specif':
+            text = f'specificity = {metrics.get_specificity()}'
+          elif body == 'sensit':
+            text = f'sensitivity = {metrics.get_sensitivity()}'
+          elif body == 'precis':
+            text = f'precision = {metrics.get_precision()}'
+          elif body == 'acc':
+            text = f'accuracy = {metrics.get_accuracy()}'
+          elif body == 'recall':
+            text = f'recall = {metrics.get_recall()}'
+          elif body == 'fout':
+            text = f'fallout = {metrics.get_fallout()}'
+          else:
+            text = f'confusion matrix = {metrics.get_confusion_matrix()}'
         elif body == 'bias':
           text = f'bias = {g.analyzer.get_bias()}'
-        elif body == 'cm':
-          text = f'confusion matrix = {g.analyzer.get_confusion_matrix()}'
         elif body == 'auc':
-          text = f'auc = {g.analyzer.get_auc()}'
+          if len(g.modeller.logistic_models) == 0:
+            g.debug.prn(self, 'Logistic model has not been generated.', 1)
+            return
+          auc = g.analyzer.get_auc(g.modeller.logistic(0))
+          if auc == None:
+            return
+          text = f'auc = {auc}'
         else:
           g.debug.prn(self, 'Variable could not be found.', 1)
           return
@@ -1,7 +1,7 @@
-from utils import ImageManager
 from utils import Randomizer
 from utils import Debugger
 from utils import OutputFileFormatter
+from utils import RenderCache
 
 from guis import GUI
 from guis import Console
@@ -28,6 +28,7 @@ def init_globals():
   g.modeller = Modeller(g.analyzer)
   g.gui = GUI(plotter, g.analyzer, g.modeller)
   g.output_file_formatter = OutputFileFormatter()
+  g.render_cache = RenderCache()
   g.mapper = Mapper()
 
 def gen_plot():
@@ -43,6 +44,7 @@ def gen_plot():
   scatter.add_x(g.x)
   scatter.add_y(g.y)
   plotter.load(scatter)
+  plotter.set_output_height(g.image_height)
 
   plotter.save()
   plotter.close()
@@ -50,9 +52,8 @@ def gen_plot():
   # g.modeller.gen_least_squares(x,y)
   # g.analyzer.f_dist(LinearModel, 100)
 
-  image_manager.scale(g.files['plot'], g.files['plot'], g.image_height)
-
-if len(sys.argv) != 2:
+if __name__ == '__main__':
+  if len(sys.argv) != 2:
     print(f'Usage: {sys.argv[0]} <debug_mode>')
     print('debug_level -->')
     print('\t0 - Supress all messages.')
@@ -61,18 +62,17 @@ if len(sys.argv) != 2:
     print('\t3 - Show all messages.')
     quit()
 
-g.debug_level = int(sys.argv[1])
+  g.debug_level = int(sys.argv[1])
 
-plotter = Plotter()
-init_globals()
-g.output_file_formatter.format_folder('imgs')
-image_manager = ImageManager()
+  plotter = Plotter()
+  init_globals()
+  g.output_file_formatter.format_folder('imgs')
 
-gen_plot()
+  gen_plot()
 
-#sg.theme('Dark Red 5')
+  #sg.theme('Dark Red 5')
 
-g.gui.standard()
-g.gui.compile()
-g.gui.loop()
-g.gui.close()
+  g.gui.standard()
+  g.gui.compile()
+  g.gui.loop()
+  g.gui.close()
@@ -1,15 +1,17 @@
 from utils import Debugger
 from utils import Math
-from utils import ImageManager
 from utils import Randomizer
+from utils import ModelCache
 
 from visualize import Plotter
 from visualize import ScatterSketch
 from visualize import SmoothSketch
 from visualize import HistogramSketch
 from visualize import VerticalLineSketch
+from visualize import ResidualSketch
 from visualize import HorizontalLineSketch
 
+import os
 import math
 import config as g
 import numpy as np
@@ -23,48 +25,204 @@ class Modeller(object):
     self.linear_models = []
     self.logistic_models = []
     self.ridge_models = []
+    self.lasso_models = []
+    self.theil_sen_models = []
+    self.segmented_models = []
+    self.multivariate_models = []
+    self.cache = ModelCache()
     g.debug.prn(self, 'Modeller object created.')
   def class_name(self):
     return "Modeller"
   def linear(self, index):
     g.debug.prn(self, 'Returned linear model.')
     return self.linear_models[index]
+  def theil_sen(self, index):
+    g.debug.prn(self, 'Returned Theil-Sen model.')
+    return self.theil_sen_models[index]
+  def segmented(self, index):
+    g.debug.prn(self, 'Returned segmented model.')
+    return self.segmented_models[index]
   def logistic(self, index):
     g.debug.prn(self, 'Returned logistic model.')
     return self.logistic_models[index]
-  def gen_linear(self, slope, yint, x, y):
+  def reuse(self, models, key):
+    # Refitting identical data hands back the model already in the list.
+    for model in models:
+      if model.get_cache_key() == key:
+        g.debug.prn(self, f'Reused {model.class_name()} {model.get_index()}.')
+        return model
+    return None
+  def add(self, models, model, key=None):
+    model.set_cache_key(key)
+    models.append(model)
+  def gen_linear(self, slope, yint, x, y, key=None):
     i = len(self.linear_models) + 1
-    linear_model = LinearModel(lambda x : slope * x + yint, x, y, i)
-    linear_model.plot()
-    self.linear_models.append(linear_model)
+    linear_model = LinearModel(None, x, y, i, coefs=[slope, yint])
+    self.add(self.linear_models, linear_model, key)
     g.debug.prn(self, 'Generated linear model.')
+    return linear_model
   def get_ridge(self, x, y):
+    key = self.cache.get_key('RidgeModel', (g.ridge_path_points,), x, y)
+    model = self.reuse(self.ridge_models, key)
+    if model != None:
+      return model
     i = len(self.ridge_models) + 1
-    slope, yint = self.analyzer.least_squares_slope_yint_eqn(x,y)
-    ridge_model = RidgeModel(lambda x : slope * x + yint, x, y, i)
-    ridge_model.plot()
-    self.ridge_models.append(ridge_model)
+    vals = self.cache.get(key)
+    if vals is None:
+      slope, yint = self.analyzer.least_squares_slope_yint_eqn(x,y)
+      ridge_model = RidgeModel(None, x, y, i, coefs=[slope, yint])
+      self.cache.put(key, np.r_[ridge_model.get_coefs(), ridge_model.get_lambda()])
+    else:
+      ridge_model = RidgeModel(None, x, y, i, coefs=vals[:2], lambda_ridge=vals[2])
+    self.add(self.ridge_models, ridge_model, key)
     g.debug.prn(self, 'Generated ridge model.')
+    return ridge_model
+  def get_lasso(self, x, y):
+    key = self.cache.get_key('LassoModel', (g.lasso_path_points, g.lasso_tol, g.lasso_max_iter), x, y)
+    model = self.reuse(self.lasso_models, key)
+    if model != None:
+      return model
+    i = len(self.lasso_models) + 1
+    vals = self.cache.get(key)
+    if vals is None:
+      slope, yint = self.analyzer.least_squares_slope_yint_eqn(x, y)
+      lasso_model = LassoModel(None, x, y, i, coefs=[slope, yint])
+      self.cache.put(key, np.r_[lasso_model.get_coefs(), lasso_model.get_lambda()])
+    else:
+      lasso_model = LassoModel(None, x, y, i, coefs=vals[:2], lambda_lasso=vals[2])
+    self.add(self.lasso_models, lasso_model, key)
+    g.debug.prn(self, 'Generated lasso model.')
+    return lasso_model
   def get_logistic(self, x, y):
+    key = self.cache.get_key('LogisticModel', (g.logistic_tol, g.logistic_max_iter), x, y)
+    model = self.reuse(self.logistic_models, key)
+    if model != None:
+      return model
     i = len(self.logistic_models) + 1
-    m, b = g.analyzer.least_squares_slope_yint_eqn(x, y)
-    f = lambda x : (math.e ** ((m * x) + (-m * b))) / (1 + (math.e ** ((m * x) + (-m * b))))
-    logistic_model = LogisticModel(f, x, y, i)
-    logistic_model.plot()
-    self.logistic_models.append(logistic_model)
+    coefs = self.cache.get(key)
+    if coefs is None:
+      offset, span = self.analyzer.get_logistic_scale(y)
+      coefs = self.analyzer.logistic_irls(x, (np.asarray(y, dtype=np.float64) - offset) / span)
+      self.cache.put(key, coefs)
+    logistic_model = LogisticModel(None, x, y, i, coefs=coefs)
+    self.add(self.logistic_models, logistic_model, key)
     g.debug.prn(self, 'Generated logistic model.')
-  def gen_least_squares(self, x, y):
-    slope, yint = self.analyzer.least_squares_slope_yint_eqn(x, y)
-    self.gen_linear(slope, yint, x, y)
+    return logistic_model
+  def multivariate(self, index):
+    g.debug.prn(self, 'Returned multivariate model.')
+    return self.multivariate_models[index]
+  def gen_multivariate(self, dataset, output_cols=None):
+    x = dataset.get_input_array(output_cols)
+    y = dataset.get_output_array(output_cols)
+    fit = self.analyzer.multivariate_least_squares(x, y)
+    if fit == None:
+      return
+    coefs, yints, r_sq, variance = fit
+    i = len(self.multivariate_models) + 1
+    multivariate_model = MultivariateLinearModel(coefs, yints, r_sq, variance, x, y, i)
+    self.multivariate_models.append(multivariate_model)
+    g.debug.prn(self, 'Generated multivariate least squares model.')
+  def gen_logistic_minibatch(self, batches):
+    # Streamed data is not kept, so the model cannot be exported.
+    coefs = self.analyzer.logistic_minibatch(batches)
+    i = len(self.logistic_models) + 1
+    logistic_model = LogisticModel(None, None, None, i, coefs=coefs)
+    self.add(self.logistic_models, logistic_model)
+    g.debug.prn(self, 'Generated logistic model from minibatches.')
+    return logistic_model
+  def gen_multivariate_lasso(self, dataset, output_col=None):
+    x = dataset.get_input_array(output_col)
+    y = dataset.get_output_array(output_col)[:, 0]
+    lambdas, coefs, yints, bic = self.analyzer.lasso_path(x, y)
+    best = np.argmin(bic)
+    ss_res = np.sum((y - (x @ coefs[best] + yints[best])) ** 2)
+    r_sq = 1 - ss_res / np.sum((y - np.mean(y)) ** 2)
+    variance = ss_res / max(len(y) - np.count_nonzero(coefs[best]) - 1, 1)
+    i = len(self.multivariate_models) + 1
+    multivariate_model = MultivariateLinearModel(coefs[best], yints[best], r_sq, variance, x, y, i)
+    self.multivariate_models.append(multivariate_model)
+    g.debug.prn(self, f'Generated multivariate lasso model with lambda {lambdas[best]}.')
+  def fit_batch(self, jobs, workers=1, executor='thread'):
+    # Headless: returns a table of fits without creating or plotting models.
+    results = self.analyzer.fit_batch(jobs, workers, executor)
+    g.debug.prn(self, f'Fitted batch of {len(jobs)} jobs.')
+    return results
+  def gen_least_squares(self, x, y=None):
+    if y is None and hasattr(x, 'finalize'):
+      return self.gen_least_squares_by_sums(x)
+    key = self.cache.get_key('LinearModel', (), x, y)
+    model = self.reuse(self.linear_models, key)
+    if model != None:
+      return model
+    coefs = self.cache.get(key)
+    if coefs is None:
+      coefs = self.analyzer.least_squares_slope_yint_eqn(x, y)
+      self.cache.put(key, coefs)
+    linear_model = self.gen_linear(coefs[0], coefs[1], x, y, key)
     g.debug.prn(self, 'Generated least squares linear model.')
+    return linear_model
+  def gen_theil_sen(self, x, y):
+    key = self.cache.get_key('TheilSenModel', (), x, y)
+    model = self.reuse(self.theil_sen_models, key)
+    if model != None:
+      return model
+    coefs = self.cache.get(key)
+    if coefs is None:
+      coefs = self.analyzer.theil_sen_slope_yint_eqn(x, y, self.randomizer)
+      if coefs == None:
+        return None
+      self.cache.put(key, coefs)
+    i = len(self.theil_sen_models) + 1
+    theil_sen_model = TheilSenModel(None, x, y, i, coefs=coefs)
+    self.add(self.theil_sen_models, theil_sen_model, key)
+    g.debug.prn(self, 'Generated Theil-Sen model.')
+    return theil_sen_model
+  def gen_segmented(self, x, y):
+    key = self.cache.get_key('SegmentedModel', (g.segmented_max_segments, g.segmented_min_size), x, y)
+    model = self.reuse(self.segmented_models, key)
+    if model != None:
+      return model
+    vals = self.cache.get(key)
+    if vals is None:
+      fit = self.analyzer.segmented_fit(x, y)
+      if fit == None:
+        return None
+      breaks, coefs, bic = fit
+      self.cache.put(key, np.r_[coefs.ravel(), breaks])
+    else:
+      # k segments are stored as 2k coefficients followed by k - 1 breaks.
+      segments = (len(vals) + 1) // 3
+      coefs = vals[:2 * segments].reshape(segments, 2)
+      breaks = vals[2 * segments:]
+    i = len(self.segmented_models) + 1
+    segmented_model = SegmentedModel(None, x, y, i, coefs=coefs, breaks=breaks)
+    self.add(self.segmented_models, segmented_model, key)
+    g.debug.prn(self, 'Generated segmented model.')
+    return segmented_model
+  def gen_least_squares_by_sums(self, accumulator):
+    # No training data is kept, so the model cannot be exported.
+    slope, yint, r_sq, variance = accumulator.finalize()
+    i = len(self.linear_models) + 1
+    linear_model = LinearModel(None, None, None, i, coefs=[slope, yint])
+    linear_model.set_accumulator(accumulator)
+    self.add(self.linear_models, linear_model)
+    g.debug.prn(self, 'Generated least squares linear model from sums.')
+    return linear_model
 
 class Model(object):
-  def __init__(self, f, training_x, training_y, index):
+  def __init__(self, f, training_x, training_y, index, coefs=None):
     self.f = f
+    self.coefs = None if coefs is None else np.asarray(coefs, dtype=np.float64)
     self.debug = Debugger()
     self.training_x = training_x
     self.training_y = training_y
     self.index = index
+    self.version = 0
+    self.accumulator = None
+    self.cache_key = None
+    # Classification metrics on the training data, by threshold, for one version.
+    self.metrics = {}
+    self.metrics_version = 0
     g.debug.prn(self, 'Model created.')
   def __str__(self):
     return "Abstract Model -- No function definable."
@@ -74,305 +232,413 @@ class Model(object):
     return self.training_x
   def get_training_y(self):
     return self.training_y
+  def get_targets(self):
+    return np.asarray(self.training_y, dtype=np.float64)
   def set_f(self, f):
     self.f = f
+    self.version += 1
+  def get_coefs(self):
+    return self.coefs
+  def set_coefs(self, coefs):
+    self.coefs = np.asarray(coefs, dtype=np.float64)
+    self.version += 1
+  def predict(self, x):
+    # Subclasses with coefficients evaluate whole arrays directly.
+    return np.asarray(self.f(np.asarray(x, dtype=np.float64)))
+  def get_version(self):
+    return self.version
+  def get_accumulator(self):
+    return self.accumulator
+  def has_training_data(self):
+    # Models fitted from sums or minibatches keep no points to plot.
+    if self.training_x is None or self.training_y is None:
+      g.debug.prn(self, 'Model was fitted without keeping its training data.', 1)
+      return False
+    return True
+  def set_accumulator(self, accumulator):
+    self.accumulator = accumulator
+  def get_metrics(self, threshold):
+    if self.metrics_version != self.version:
+      return None
+    return self.metrics.get(threshold)
+  def set_metrics(self, threshold, metrics):
+    if self.metrics_version != self.version:
+      self.metrics = {}
+      self.metrics_version = self.version
+    self.metrics[threshold] = metrics
+  def get_cache_key(self):
+    return self.cache_key
+  def set_cache_key(self, key):
+    self.cache_key = key
   def get_index(self):
     return self.index
   def at(self, x):
-    g.debug.prn(self, f'Returning value at {x}')
-    return self.f(x)
-  def plot(self):
+    g.debug.prn(self, f'Returning value at {x}', 3)
+    return self.predict(x)
+  def get_curve(self):
+    # model_precision is the sample spacing as a fraction of the x-range,
+    # so the point count does not depend on the data's units.
+    x_vals = np.asarray(self.training_x, dtype=np.float64)
+    points = int(math.ceil(1 / g.model_precision)) + 1
+    curve_x = np.linspace(x_vals.min(), x_vals.max(), points)
+    return curve_x, self.predict(curve_x)
+  def get_output_filename(self):
+    return None
+  def export(self):
+    # Rendering happens here, on request, rather than at fit time.
+    # The last render of each file is remembered, so repeats are free.
+    filename = self.get_output_filename()
+    if filename == None:
+      g.debug.prn(self, 'Model has no plot to export.', 1)
+      return None
+    if not self.has_training_data():
+      return None
+    if self.is_exported():
+      g.debug.prn(self, f'{filename} served from the last render.')
+      return filename
+    self.plot()
+    self.set_exported()
+    return filename
+  def is_exported(self):
+    filename = self.get_output_filename()
+    rendered = g.rendered.get(filename)
+    return rendered != None and rendered[0] is self and rendered[1] == self.version and os.path.exists(filename)
+  def set_exported(self):
+    g.rendered[self.get_output_filename()] = (self, self.version)
+  def get_plotter(self):
     g.debug.prn(self, 'Cannot plot abstract Model.', 1)
+    return None
+  def plot(self):
+    plotter = self.get_plotter()
+    if plotter != None:
+      plotter.save()
 
 class LinearModel(Model):
-  def __init__(self, f, training_x, training_y, index):
-    super().__init__(f, training_x, training_y, index)
+  def __init__(self, f, training_x, training_y, index, coefs=None):
+    super().__init__(f, training_x, training_y, index, coefs)
     self.math = Math()
+    if self.coefs is None:
+      self.coefs = self._coefs_from(f)
+    self.f = self.predict
     g.debug.prn(self, 'LinearModel created')
   def __str__(self):
     return f'{self.get_slope()}x + {self.get_yint()}'
   def class_name(self):
     return "LinearModel"
+  def get_output_filename(self):
+    return g.files['least-squares']
+  def get_title(self):
+    return 'Least Squares Regression'
+  def _coefs_from(self, f):
+    # A linear f is pinned down by two evaluations.
+    return np.array([f(1) - f(0), f(0)], dtype=np.float64)
+  def set_f(self, f):
+    self.set_coefs(self._coefs_from(f))
+  def predict(self, x):
+    return self.coefs[0] * np.asarray(x, dtype=np.float64) + self.coefs[1]
   def get_sum_of_squared_residuals(self):
-    ss_residuals = 0
-    for x,y in zip(self.training_x, self.training_y):
-      ss_residuals += math.abs(y - self.f(x)) ** 2
+    ss_residuals = np.sum((np.asarray(self.training_y, dtype=np.float64) - self.predict(self.training_x)) ** 2)
     g.debug.prn(self, 'SS Residuals gotten.')
     return ss_residuals
   def get_slope(self):
     g.debug.prn(self, 'Got slope.', 3)
-    return (self.f(self.training_x[0]) - self.f(self.training_x[1])) / (self.training_x[0] - self.training_x[1])
+    return self.coefs[0]
   def get_yint(self):
     g.debug.prn(self, 'Got yint.', 3)
-    return (self.f(self.training_x[0]) - self.get_slope() * self.training_x[0])
-  def plot(self):
+    return self.coefs[1]
+  def get_plotter(self):
+    if not self.has_training_data():
+      return None
     plotter = Plotter()
-    image_manager = ImageManager()
     sketches = []
-    plotter.set_output_filename(g.files['least-squares'])
-    plotter.set_title('Least Squares Regression')
+    plotter.set_output_filename(self.get_output_filename())
+    plotter.set_title(self.get_title())
     g.debug.prn(self, 'Plot basics set.')
 
-    min_x = min(self.training_x)
-    max_x = max(self.training_x)
-    x_vals = []
-    y_vals = []
-    for x in range(min_x * 100, max_x * 100):
-      x_vals.append([x / 100])
-      y_vals.append([self.f(x / 100)])
+    x_vals, y_vals = self.get_curve()
     sketches.append(SmoothSketch())
     sketches[-1].add_x(x_vals)
     sketches[-1].add_y(y_vals)
     g.debug.prn(self, 'Linear curve saved as SmoothSketch.')
 
     sketches.append(ScatterSketch())
-    sketches[-1].add_x(list(self.training_x))
-    sketches[-1].add_y(list(self.training_y))
+    sketches[-1].add_x(self.training_x)
+    sketches[-1].add_y(self.training_y)
     g.debug.prn(self, 'Points saved as ScatterSketch.')
 
-    for i in range(len(self.training_x)):
-      if self.f(self.training_x[i]) > self.training_y[i]:
-        y_max = self.f(self.training_x[i])
-        y_min = self.training_y[i]
-      else:
-        y_min = self.f(self.training_x[i])
-        y_max = self.training_y[i]
-      sketches.append(VerticalLineSketch())
-      sketches[-1].set_y_max(y_max)
-      sketches[-1].set_y_min(y_min)
-      sketches[-1].set_x(self.training_x[i])
-      g.debug.prn(self, 'Vertical line appended.', 3)
-    g.debug.prn(self, 'SSR lines drawn as VerticalLineSketch(s).')
+    sketches.append(ResidualSketch())
+    sketches[-1].add_x(self.training_x)
+    sketches[-1].add_y(self.training_y)
+    sketches[-1].add_fitted(self.predict(self.training_x))
+    g.debug.prn(self, 'SSR lines drawn as ResidualSketch.')
 
     plotter.load(sketches)
-    plotter.save()
-    plotter.close()
-    g.debug.prn(self, 'All sketches loaded and saved.')
+    plotter.set_output_height(250)
+    g.debug.prn(self, 'All sketches loaded.')
+    return plotter
+
+class TheilSenModel(LinearModel):
+  def __init__(self, f, training_x, training_y, index, coefs=None):
+    super().__init__(f, training_x, training_y, index, coefs)
+    g.debug.prn(self, 'TheilSenModel created')
+  def class_name(self):
+    return "TheilSenModel"
+  def get_output_filename(self):
+    return g.files['theil-sen-regression']
+  def get_title(self):
+    return 'Theil-Sen Regression'
+
+class SegmentedModel(Model):
+  def __init__(self, f, training_x, training_y, index, coefs=None, breaks=None):
+    # coefs holds one [slope, yint] row per segment, split at breaks.
+    super().__init__(f, training_x, training_y, index, coefs)
+    self.breaks = np.asarray(breaks, dtype=np.float64)
+    self.f = self.predict
+    g.debug.prn(self, 'SegmentedModel created')
+  def __str__(self):
+    return ' | '.join(f'{slope}x + {yint}' for slope, yint in self.coefs)
+  def class_name(self):
+    return "SegmentedModel"
+  def get_output_filename(self):
+    return g.files['segmented-regression']
+  def get_breaks(self):
+    return self.breaks
+  def get_segment(self, x):
+    return np.searchsorted(self.breaks, x, side='right')
+  def predict(self, x):
+    x = np.asarray(x, dtype=np.float64)
+    segment = self.get_segment(x)
+    return self.coefs[segment, 0] * x + self.coefs[segment, 1]
+  def get_plotter(self):
+    plotter = Plotter()
+    sketches = []
+    plotter.set_output_filename(self.get_output_filename())
+    plotter.set_title('Segmented Regression')
+    g.debug.prn(self, 'Plot basics set.')
+
+    # One curve per segment, so the jumps at the breaks are not joined up.
+    x_vals, y_vals = self.get_curve()
+    segments = self.get_segment(x_vals)
+    for i in range(len(self.coefs)):
+      sketches.append(SmoothSketch())
+      sketches[-1].add_x(x_vals[segments == i])
+      sketches[-1].add_y(y_vals[segments == i])
+    g.debug.prn(self, 'Segment curves saved as SmoothSketch(s).')
+
+    sketches.append(ScatterSketch())
+    sketches[-1].add_x(self.training_x)
+    sketches[-1].add_y(self.training_y)
+    g.debug.prn(self, 'Points saved as ScatterSketch.')
 
-    image_manager.scale(g.files['least-squares'], g.files['least-squares'], 250)
+    for x in self.breaks:
+      sketches.append(VerticalLineSketch())
+      sketches[-1].set_y_max(float(np.max(self.training_y)))
+      sketches[-1].set_y_min(float(np.min(self.training_y)))
+      sketches[-1].set_x(x)
+    g.debug.prn(self, 'Breakpoints drawn as VerticalLineSketch(s).')
 
-    del plotter
-    del image_manager
-    g.debug.prn(self, 'Plotter and ImageManager objects deleted', 3)
+    plotter.load(sketches)
+    plotter.set_output_height(250)
+    g.debug.prn(self, 'All sketches loaded.')
+    return plotter
+
+class MultivariateLinearModel(Model):
+  def __init__(self, coefs, yints, r_sq, variance, training_x, training_y, index):
+    # coefs is (inputs, responses); yints, r_sq and variance hold one value per response.
+    super().__init__(None, training_x, training_y, index, coefs)
+    self.yints = yints
+    self.f = self.predict
+    self.r_sq = r_sq
+    self.variance = variance
+    g.debug.prn(self, 'MultivariateLinearModel created')
+  def __str__(self):
+    return f'{self.coefs.T.tolist()} . x + {np.ravel(self.yints).tolist()}'
+  def class_name(self):
+    return "MultivariateLinearModel"
+  def get_coefs(self):
+    return self.coefs
+  def get_yints(self):
+    return self.yints
+  def get_r_sq(self):
+    return self.r_sq
+  def get_variance(self):
+    return self.variance
+  def predict(self, x):
+    return np.asarray(x, dtype=np.float64) @ self.coefs + self.yints
+  def get_plotter(self):
+    g.debug.prn(self, 'Cannot plot a multivariate model.', 1)
+    return None
 
 class LogisticModel(Model):
-  def __init__(self, f, training_x, training_y, index):
-    super().__init__(f, training_x, training_y, index)
+  def __init__(self, f, training_x, training_y, index, coefs=None):
+    super().__init__(f, training_x, training_y, index, coefs)
     self.math = Math()
+    # coefs are the slope and intercept of the log-odds.
+    if self.coefs is None:
+      self.coefs = self._coefs_from(f)
+    self.f = self.predict
   def class_name(self):
     return "LogisticModel"
-  def plot(self):
+  def get_output_filename(self):
+    return g.files['logistic-regression']
+  def _coefs_from(self, f):
+    yint = self.math.logit(f(0))
+    return np.array([self.math.logit(f(1)) - yint, yint], dtype=np.float64)
+  def set_f(self, f):
+    self.set_coefs(self._coefs_from(f))
+  def predict(self, x):
+    x = np.asarray(x, dtype=np.float64)
+    if x.ndim == 2:
+      log_odds = x @ self.coefs[:-1] + self.coefs[-1]
+    elif len(self.coefs) == 2:
+      log_odds = self.coefs[0] * x + self.coefs[1]
+    else:
+      g.debug.prn(self, f'Model takes {len(self.coefs) - 1} features; pass a (rows x features) array.', 1)
+      return None
+    with np.errstate(over='ignore'):
+      return 1 / (1 + np.exp(-log_odds))
+  def get_targets(self):
+    # The fit sees y mapped onto [0, 1]; metrics should too.
+    if self.training_y is None:
+      g.debug.prn(self, 'Model was fitted from streamed data and kept no targets.', 1)
+      return None
+    offset, span = g.analyzer.get_logistic_scale(self.training_y)
+    return (np.asarray(self.training_y, dtype=np.float64) - offset) / span
+  def get_plotter(self):
+    if not self.has_training_data():
+      return None
     plotter = Plotter()
-    image_manager = ImageManager()
     sketches = []
-    plotter.set_output_filename(g.files['logistic-regression'])
+    plotter.set_output_filename(self.get_output_filename())
     plotter.set_title('Logistic Regression')
     g.debug.prn(self, 'Plot basics set.')
 
-    min_x = min(self.training_x)
-    max_x = max(self.training_x)
-    min_y = min(self.training_y)
-    max_y = max(self.training_y)
-    x_vals = []
-    y_vals = []
-    for x in range(min_x * 100, max_x * 100):
-      y_adjust = self.f(x / 100) * (max_y - min_y) + min_y
-      x_vals.append([x / 100])
-      y_vals.append([y_adjust])
+    offset, span = g.analyzer.get_logistic_scale(self.training_y)
+    x_vals, y_vals = self.get_curve()
+    y_vals = y_vals * span + offset
     sketches.append(SmoothSketch())
     sketches[-1].add_x(x_vals)
     sketches[-1].add_y(y_vals)
     g.debug.prn(self, 'Curve added to sketches list.')
 
     sketches.append(ScatterSketch())
-    sketches[-1].add_x(list(self.training_x))
-    sketches[-1].add_y(list(self.training_y))
+    sketches[-1].add_x(self.training_x)
+    sketches[-1].add_y(self.training_y)
     g.debug.prn(self, 'Scatter of points added to sketches list.')
 
     plotter.load(sketches)
-    plotter.save()
-    plotter.close()
-    g.debug.prn(self, 'All sketches loaded and saved.')
-
-    image_manager.scale(g.files['logistic-regression'], g.files['logistic-regression'], 250)
-
-    del plotter
-    del image_manager
-    g.debug.prn(self, 'Plotter and ImageManager objects deleted', 3)
+    plotter.set_output_height(250)
+    g.debug.prn(self, 'All sketches loaded.')
+    return plotter
 
 
 class RidgeModel(LinearModel):
-  def __init__(self, f, training_x, training_y, index):
-    super().__init__(f, training_x, training_y, index)
+  def __init__(self, f, training_x, training_y, index, coefs=None, lambda_ridge=None):
+    super().__init__(f, training_x, training_y, index, coefs)
     self.math = Math()
-    self.regularize()
+    if lambda_ridge == None:
+      self.lambda_ridge = 0
+      self.regularize()
+    else:
+      self.lambda_ridge = lambda_ridge
     g.debug.prn(self, 'RidgeModel created')
   def class_name(self):
     return "RidgeModel"
+  def get_output_filename(self):
+    return g.files['ridge-regression']
   def regularize(self):
-    y_av = np.mean(self.training_y)
-    x_av = np.mean(self.training_x)
-    lambda_ridge = 0
-    tr_x = self.training_x[:math.floor(len(self.training_x) / 10)]
-    te_x = self.training_x[math.ceil(len(self.training_x) / 10):]
-    variance = g.analyzer.get_variance_by_parts(self.f, tr_x)
-    bias = g.analyzer.get_variance_by_parts(self.f, te_x)
-    prev_epsilon = variance + bias ** 2
-    while True:
-      lambda_ridge += 0.1 * lambda_ridge
-      m = self.get_slope()
-      b = self.get_yint()
-      f = lambda x : lambda_ridge * m * x + lambda_ridge * b + epsilon
-      variance = g.analyzer.get_variance_by_parts(f, tr_x)
-      bias = g.analyzer.get_variance_by_parts(f, te_x)
-      epsilon = variance + bias ** 2
-      print(f'Lambda: {lambda_ridge}, Epsilon: {epsilon}')
-      if prev_epsilon <= epsilon:
-        self.f = f
-        break
+    lambdas, coefs, yints, gcv = g.analyzer.ridge_path(self.training_x, self.training_y)
+    best = np.argmin(gcv)
+    self.lambda_ridge = lambdas[best]
+    self.set_coefs([coefs[best, 0], yints[best]])
+    g.debug.prn(self, f'Lambda {self.lambda_ridge} selected by generalized cross-validation.')
+  def get_lambda(self):
+    return self.lambda_ridge
   def set_slope(self, slope):
-    yint = self.get_yint()
-    self.f = lambda x : slope * x + yint
+    self.set_coefs([slope, self.get_yint()])
   def set_yint(self, yint):
-    slope = self.get_slope()
-    self.f = lambda x : slope * x + yint
-  def plot(self):
+    self.set_coefs([self.get_slope(), yint])
+  def get_plotter(self):
     plotter = Plotter()
-    image_manager = ImageManager()
     sketches = []
-    plotter.set_output_filename(g.files['ridge-regression'])
+    plotter.set_output_filename(self.get_output_filename())
     plotter.set_title('Ridge Regression')
     g.debug.prn(self, 'Plot basics set.')
 
-    min_x = min(self.training_x)
-    max_x = max(self.training_x)
-    x_vals = []
-    y_vals = []
-    for x in range(min_x * 100, max_x * 100):
-      x_vals.append([x / 100])
-      y_vals.append([self.f(x / 100)])
+    x_vals, y_vals = self.get_curve()
     sketches.append(SmoothSketch())
     sketches[-1].add_x(x_vals)
     sketches[-1].add_y(y_vals)
     g.debug.prn(self, 'Linear curve saved as SmoothSketch.')
 
     sketches.append(ScatterSketch())
-    sketches[-1].add_x(list(self.training_x))
-    sketches[-1].add_y(list(self.training_y))
+    sketches[-1].add_x(self.training_x)
+    sketches[-1].add_y(self.training_y)
     g.debug.prn(self, 'Points saved as ScatterSketch.')
 
-    for i in range(len(self.training_x)):
-      if self.f(self.training_x[i]) > self.training_y[i]:
-        y_max = self.f(self.training_x[i])
-        y_min = self.training_y[i]
-      else:
-        y_min = self.f(self.training_x[i])
-        y_max = self.training_y[i]
-      sketches.append(VerticalLineSketch())
-      sketches[-1].set_y_max(y_max)
-      sketches[-1].set_y_min(y_min)
-      sketches[-1].set_x(self.training_x[i])
-      g.debug.prn(self, 'Vertical line appended.', 3)
-    g.debug.prn(self, 'SSR lines drawn as VerticalLineSketch(s).')
+    sketches.append(ResidualSketch())
+    sketches[-1].add_x(self.training_x)
+    sketches[-1].add_y(self.training_y)
+    sketches[-1].add_fitted(self.predict(self.training_x))
+    g.debug.prn(self, 'SSR lines drawn as ResidualSketch.')
 
     plotter.load(sketches)
-    plotter.save()
-    plotter.close()
-    g.debug.prn(self, 'All sketches loaded and saved.')
-
-    image_manager.scale(g.files['ridge-regression'], g.files['ridge-regression'], 250)
-
-    del plotter
-    del image_manager
-    g.debug.prn(self, 'Plotter and ImageManager objects deleted', 3)
+    plotter.set_output_height(250)
+    g.debug.prn(self, 'All sketches loaded.')
+    return plotter
 
 class LassoModel(LinearModel):
-  def __init__(self, f, training_x, training_y, index):
-    super().__init__(f, training_x, training_y, index)
+  def __init__(self, f, training_x, training_y, index, coefs=None, lambda_lasso=None):
+    super().__init__(f, training_x, training_y, index, coefs)
     self.math = Math()
-    self.regularize()
+    if lambda_lasso == None:
+      self.lambda_lasso = 0
+      self.regularize()
+    else:
+      self.lambda_lasso = lambda_lasso
     g.debug.prn(self, 'LassoModel created')
   def class_name(self):
     return "LassoModel"
+  def get_output_filename(self):
+    return g.files['lasso-regression']
   def regularize(self):
-    y_av = np.mean(self.training_y)
-    x_av = np.mean(self.training_x)
-    while True:
-      upper_m = self.get_slope() * 1.1
-      lower_m = self.get_slope() * (1 - 2 * (1.1 - 1))
-      upper_b = y_av - upper_m * x_av
-      lower_b = y_av - lower_m * x_av
-      upper_f = lambda x : upper_m * x + upper_b
-      lower_f = lambda x : lower_m * x + lower_b
-      upper_v = g.analyzer.get_variance_by_parts(upper_f, self.training_x)
-      lower_v = g.analyzer.get_variance_by_parts(lower_f, self.training_x)
-      var = g.analyzer.get_variance(self)
-      print(upper_m)
-      print(lower_m)
-      if lower_m - self.get_slope() < 0.0001:
-        if upper_m - self.get_slope() < 0.0001:
-          break
-      if var > upper_v and var > lower_v:
-        break
-      elif upper_v > lower_v:
-        self.set_slope(upper_m)
-        self.set_yint(upper_b)
-      else:
-        self.set_slope(lower_m)
-        self.set_yint(lower_b)
+    lambdas, coefs, yints, bic = g.analyzer.lasso_path(self.training_x, self.training_y)
+    best = np.argmin(bic)
+    self.lambda_lasso = lambdas[best]
+    self.set_coefs([coefs[best, 0], yints[best]])
+    g.debug.prn(self, f'Lambda {self.lambda_lasso} selected by BIC.')
+  def get_lambda(self):
+    return self.lambda_lasso
   def set_slope(self, slope):
-    yint = self.get_yint()
-    self.f = lambda x : slope * x + yint
+    self.set_coefs([slope, self.get_yint()])
   def set_yint(self, yint):
-    slope = self.get_slope()
-    self.f = lambda x : slope * x + yint
-  def plot(self):
+    self.set_coefs([self.get_slope(), yint])
+  def get_plotter(self):
     plotter = Plotter()
-    image_manager = ImageManager()
     sketches = []
-    plotter.set_output_filename(g.files['ridge-regression'])
-    plotter.set_title('Ridge Regression')
+    plotter.set_output_filename(self.get_output_filename())
+    plotter.set_title('Lasso Regression')
     g.debug.prn(self, 'Plot basics set.')
 
-    min_x = min(self.training_x)
-    max_x = max(self.training_x)
-    x_vals = []
-    y_vals = []
-    for x in range(min_x * 100, max_x * 100):
-      x_vals.append([x / 100])
-      y_vals.append([self.f(x / 100)])
+    x_vals, y_vals = self.get_curve()
     sketches.append(SmoothSketch())
     sketches[-1].add_x(x_vals)
     sketches[-1].add_y(y_vals)
     g.debug.prn(self, 'Linear curve saved as SmoothSketch.')
 
     sketches.append(ScatterSketch())
-    sketches[-1].add_x(list(self.training_x))
-    sketches[-1].add_y(list(self.training_y))
+    sketches[-1].add_x(self.training_x)
+    sketches[-1].add_y(self.training_y)
     g.debug.prn(self, 'Points saved as ScatterSketch.')
 
-    for i in range(len(self.training_x)):
-      if self.f(self.training_x[i]) > self.training_y[i]:
-        y_max = self.f(self.training_x[i])
-        y_min = self.training_y[i]
-      else:
-        y_min = self.f(self.training_x[i])
-        y_max = self.training_y[i]
-      sketches.append(VerticalLineSketch())
-      sketches[-1].set_y_max(y_max)
-      sketches[-1].set_y_min(y_min)
-      sketches[-1].set_x(self.training_x[i])
-      g.debug.prn(self, 'Vertical line appended.', 3)
-    g.debug.prn(self, 'SSR lines drawn as VerticalLineSketch(s).')
+    sketches.append(ResidualSketch())
+    sketches[-1].add_x(self.training_x)
+    sketches[-1].add_y(self.training_y)
+    sketches[-1].add_fitted(self.predict(self.training_x))
+    g.debug.prn(self, 'SSR lines drawn as ResidualSketch.')
 
     plotter.load(sketches)
-    plotter.save()
-    plotter.close()
-    g.debug.prn(self, 'All sketches loaded and saved.')
-
-    image_manager.scale(g.files['ridge-regression'], g.files['ridge-regression'], 250)
-
-    del plotter
-    del image_manager
-    g.debug.prn(self, 'Plotter and ImageManager objects deleted', 3)
+    plotter.set_output_height(250)
+    g.debug.prn(self, 'All sketches loaded.')
+    return plotter
 
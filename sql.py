@@ -1,4 +1,5 @@
 import sqlite3 as sql
+import numpy as np
 from utils import Debugger
 
 class FieldManager(object):
@@ -63,4 +64,17 @@ class SQLConnection(object):
     if select_code != None:
       self.queue(select_code)
     self.debug.prn(self, 'Data fetched.')
-    return self.crsr.fetchall()
\ No newline at end of file
+    return self.crsr.fetchall()
+  def fetch_chunks(self, select_code, size):
+    # (inputs, output) pairs like DataSet.get_chunks; the last selected
+    # column is the output.
+    # A separate cursor, so other queries can run between chunks.
+    crsr = self.conn.cursor()
+    crsr.execute(select_code)
+    while True:
+      rows = crsr.fetchmany(size)
+      if len(rows) == 0:
+        break
+      rows = np.array(rows, dtype=np.float64)
+      yield rows[:, :-1], rows[:, -1]
+    self.debug.prn(self, 'Data fetched in chunks.')
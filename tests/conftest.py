@@ -0,0 +1,61 @@
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+import pytest
+import config as g
+from utils import Debugger
+from utils import Randomizer
+
+g.debug_level = 1
+g.debug = Debugger()
+g.randomizer = Randomizer()
+
+from analyze import Analyzer
+from model import Modeller
+
+@pytest.fixture(autouse=True)
+def workspace(tmp_path, monkeypatch):
+  # Caches write relative to the working directory.
+  monkeypatch.chdir(tmp_path)
+  g.rendered = {}
+  g.render_cache = None
+  g.analyzer = Analyzer()
+  g.modeller = Modeller(g.analyzer)
+  yield tmp_path
+
+@pytest.fixture
+def analyzer():
+  return g.analyzer
+
+@pytest.fixture
+def modeller():
+  return g.modeller
+
+def make_linear_data(n=500, p=None, seed=0, offset=0.0, correlated=False):
+  # y = 3 x - 2 + noise. With p columns the coefficients are 3, -1, 0.5
+  # and then zeros, so some columns are irrelevant; correlated mixes them.
+  rng = np.random.default_rng(seed)
+  x = rng.normal(size=n if p == None else (n, p))
+  if correlated:
+    x = x @ (np.eye(p) + 0.5)
+  x = x + offset
+  if p == None:
+    return x, 3 * x - 2 + rng.normal(size=n)
+  coefs = np.r_[3.0, -1.0, 0.5, np.zeros(max(p - 3, 0))][:p]
+  return x, x @ coefs - 2 + rng.normal(size=n)
+
+def make_logistic_data(n=2000, p=1, seed=0):
+  # 0/1 labels drawn from a logistic model on p standard normal columns.
+  rng = np.random.default_rng(seed)
+  x = rng.normal(size=(n, p))
+  log_odds = x @ np.linspace(1.5, -0.5, p) + 0.3
+  return x, (rng.random(n) < 1 / (1 + np.exp(-log_odds))).astype(float)
+
+@pytest.fixture
+def linear_data():
+  return make_linear_data
+
+@pytest.fixture
+def logistic_data():
+  return make_logistic_data
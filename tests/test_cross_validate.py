@@ -0,0 +1,63 @@
+import numpy as np
+from model import LassoModel
+from model import LinearModel
+from model import LogisticModel
+from model import RidgeModel
+from utils import Randomizer
+
+def get_folds(n, k, seed):
+  folds = np.empty(n, dtype=int)
+  folds[Randomizer(seed).rng.permutation(n)] = np.arange(n) % k
+  return folds
+
+def brute_errors(x, y, folds, k, fit):
+  errors = []
+  for i in range(k):
+    train = folds != i
+    slope, yint = fit(x[train], y[train])
+    errors.append(np.mean((y[~train] - (slope * x[~train] + yint)) ** 2))
+  return np.array(errors)
+
+def test_linear_matches_refitting(analyzer, linear_data):
+  x, y = linear_data(n=200, offset=50)
+  result = analyzer.cross_validate(LinearModel, (x, y), k=5, randomizer=Randomizer(4))
+  expected = brute_errors(x, y, get_folds(len(x), 5, 4), 5, lambda a, b : np.polyfit(a, b, 1))
+  assert np.allclose(result['errors'], expected)
+  assert np.isclose(result['mean_error'], np.mean(expected))
+
+def test_ridge_matches_refitting(analyzer, linear_data):
+  x, y = linear_data(n=200, seed=1, offset=50)
+  def fit(a, b):
+    dx = a - a.mean()
+    slope = np.dot(dx, b - b.mean()) / (np.dot(dx, dx) + 30.0)
+    return slope, b.mean() - slope * a.mean()
+  result = analyzer.cross_validate(RidgeModel, (x, y), k=4, penalty=30.0, randomizer=Randomizer(2))
+  assert np.allclose(result['errors'], brute_errors(x, y, get_folds(len(x), 4, 2), 4, fit))
+
+def test_logistic_thread_and_process_agree(analyzer):
+  rng = np.random.default_rng(5)
+  x = rng.normal(size=300)
+  y = (x + rng.normal(size=300) > 0).astype(float)
+  thread = analyzer.cross_validate(LogisticModel, (x, y), k=3, workers=2, randomizer=Randomizer(1))
+  process = analyzer.cross_validate(LogisticModel, (x, y), k=3, workers=2, executor='process', randomizer=Randomizer(1))
+  assert np.allclose(thread['errors'], process['errors'])
+
+def test_penalties_match_path_selection(analyzer, linear_data):
+  x, y = linear_data(n=120, seed=3, offset=50)
+  y = y + 4 * np.random.default_rng(3).normal(size=120)
+  folds = get_folds(len(x), 4, 6)
+  ridge = analyzer.cross_validate(RidgeModel, (x, y), k=4, randomizer=Randomizer(6))
+  lasso = analyzer.cross_validate(LassoModel, (x, y), k=4, randomizer=Randomizer(6))
+  for i in range(4):
+    train = folds != i
+    lambdas, coefs, yints, gcv = analyzer.ridge_path(x[train], y[train])
+    assert np.isclose(ridge['penalties'][i], lambdas[np.argmin(gcv)])
+    lambdas, coefs, yints, bic = analyzer.lasso_path(x[train], y[train])
+    assert np.isclose(lasso['penalties'][i], lambdas[np.argmin(bic)])
+  def fit(a, b, lam):
+    dx = a - a.mean()
+    slope = np.dot(dx, b - b.mean()) / (np.dot(dx, dx) + lam)
+    return slope, b.mean() - slope * a.mean()
+  penalties = iter(ridge['penalties'])
+  expected = brute_errors(x, y, folds, 4, lambda a, b : fit(a, b, next(penalties)))
+  assert np.allclose(ridge['errors'], expected)
@@ -0,0 +1,35 @@
+import numpy as np
+from model import LinearModel
+from model import LogisticModel
+from model import RidgeModel
+
+def test_matches_single_fits(analyzer):
+  rng = np.random.default_rng(0)
+  jobs = []
+  for i in range(6):
+    x = rng.normal(size=30 + 10 * (i % 2))
+    jobs.append((LinearModel, x, i * x + rng.normal(size=len(x))))
+  x = rng.normal(size=80)
+  jobs.append((RidgeModel, x, x + rng.normal(size=80)))
+  jobs.append((LogisticModel, x, (x + rng.normal(size=80) > 0).astype(float)))
+  jobs.append((str, x, x))
+  results = analyzer.fit_batch(jobs, workers=2, executor='process')
+  assert list(results.index) == list(range(8))
+  for i, (model_type, x, y) in enumerate(jobs[:6]):
+    slope, yint = np.polyfit(x, y, 1)
+    assert np.allclose(results.loc[i, ['slope', 'yint']].to_numpy(dtype=float), [slope, yint])
+    assert results.loc[i, 'n'] == len(x)
+  for i in [6, 7]:
+    expected = analyzer.fit_single(*jobs[i])
+    assert results.loc[i, 'model'] == expected[0]
+    assert np.allclose(results.loc[i].to_numpy()[1:].astype(float), expected[1:], equal_nan=True)
+
+def test_logistic_fits_agree(analyzer, modeller):
+  rng = np.random.default_rng(4)
+  x = rng.normal(size=200)
+  y = 20 + 30 * (x + rng.normal(size=200) > 0)
+  row = analyzer.fit_single(LogisticModel, x, y)
+  slope, yint, predict = analyzer.get_logistic_predictor(x, y)
+  assert np.allclose(row[2:4], [slope, yint])
+  assert np.allclose(row[2:4], modeller.get_logistic(x, y).get_coefs())
+  assert np.isclose(row[6], np.mean((y - predict(x)) ** 2))
@@ -0,0 +1,18 @@
+import numpy as np
+from sklearn.linear_model import Lasso
+
+def test_lasso_path_matches_sklearn(analyzer, linear_data):
+  x, y = linear_data(n=300, p=8, offset=10, correlated=True)
+  lambdas, coefs, yints, bic = analyzer.lasso_path(x, y, tol=1e-14, max_iter=100000)
+  for lam, b, a in list(zip(lambdas, coefs, yints))[::5]:
+    reference = Lasso(alpha=lam, tol=1e-12, max_iter=100000).fit(x, y)
+    assert np.allclose(b, reference.coef_, atol=1e-6)
+    assert np.isclose(a, reference.intercept_, atol=1e-5)
+    assert np.array_equal(b != 0, reference.coef_ != 0)
+
+def test_lasso_path_starts_empty(analyzer, linear_data):
+  x, y = linear_data(n=300, p=8, seed=2, offset=10, correlated=True)
+  lambdas, coefs, yints, bic = analyzer.lasso_path(x, y)
+  assert not coefs[0].any()
+  assert coefs[-1][:3].all()
+  assert np.allclose(yints[0], np.mean(y))
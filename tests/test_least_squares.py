@@ -0,0 +1,84 @@
+import numpy as np
+from analyze import LeastSquaresAccumulator
+
+def test_least_squares_matches_polyfit(analyzer, linear_data):
+  x, y = linear_data()
+  slope, yint = analyzer.least_squares_slope_yint_eqn(x, y)[:2]
+  assert np.allclose([slope, yint], np.polyfit(x, y, 1))
+
+def test_accumulator_merge_matches_polyfit(linear_data):
+  # Large offsets are where raw power sums lose precision.
+  x, y = linear_data(n=3000, offset=1e6)
+  parts = []
+  for chunk in np.array_split(np.arange(len(x)), 7):
+    parts.append(LeastSquaresAccumulator().update((x[chunk], y[chunk])))
+  merged = LeastSquaresAccumulator()
+  for part in parts[::-1]:
+    merged.merge(part)
+  whole = LeastSquaresAccumulator().update(np.column_stack([x, y]))
+  slope, yint, r_sq, variance = merged.finalize()
+  assert merged.get_n() == len(x)
+  assert np.allclose([slope, yint], np.polyfit(x, y, 1), rtol=1e-8)
+  assert np.isclose(r_sq, np.corrcoef(x, y)[0, 1] ** 2)
+  assert np.isclose(variance, np.var(x))
+  assert np.allclose(whole.finalize(), merged.finalize())
+
+def test_accumulator_model_has_no_plot(analyzer, modeller, linear_data):
+  x, y = linear_data()
+  model = modeller.gen_least_squares(LeastSquaresAccumulator().update((x, y)))
+  assert model is modeller.linear(0)
+  assert np.isclose(analyzer.get_r_sq(model), np.corrcoef(x, y)[0, 1] ** 2)
+  assert model.get_plotter() is None
+  assert model.export() is None
+  assert analyzer.get_bootstrap_ci(model.get_training_x(), model.get_training_y()) is None
+
+def test_bootstrap_ci_covers_fit(analyzer, linear_data):
+  x, y = linear_data(n=400, seed=4)
+  ci = analyzer.get_bootstrap_ci(x, y, trials=2000, seed=1)
+  slope, yint = np.polyfit(x, y, 1)
+  assert ci['slope'][0] < slope < ci['slope'][1]
+  assert ci['yint'][0] < yint < ci['yint'][1]
+  # Roughly the normal-theory interval for the slope.
+  resid = y - (slope * x + yint)
+  se = np.sqrt(np.sum(resid ** 2) / (len(x) - 2) / np.sum((x - x.mean()) ** 2))
+  assert np.isclose(ci['slope'][1] - ci['slope'][0], 2 * 1.96 * se, rtol=0.15)
+
+def test_batch_matches_polyfit(analyzer):
+  rng = np.random.default_rng(2)
+  x = rng.normal(size=(6, 50))
+  y = rng.normal(size=(6, 50)) + x * np.arange(6)[:, None]
+  slopes, yints = analyzer.least_squares_batch(x, y)
+  for row in range(6):
+    assert np.allclose([slopes[row], yints[row]], np.polyfit(x[row], y[row], 1))
+  # A shared x broadcasts against every row of y.
+  slopes, yints = analyzer.least_squares_batch(x[0], y)
+  assert np.allclose([slopes[3], yints[3]], np.polyfit(x[0], y[3], 1))
+
+def test_ss_res(analyzer, linear_data):
+  x, y = linear_data(n=50)
+  f = lambda vals : 3 * vals - 2
+  expected = sum((b - f(a)) ** 2 for a, b in zip(x, y))
+  assert np.isclose(analyzer.get_ss_res_by_parts(x, y, f), expected)
+  assert np.isclose(analyzer.get_ss_res(np.column_stack([x, y]), f), expected)
+
+def test_ssr_by_slope_matches_direct_sums(analyzer, linear_data):
+  x, y = linear_data(n=60)
+  slopes = np.linspace(-5, 10, 31)
+  expected = [np.sum((y - (m * x + np.mean(y) - m * np.mean(x))) ** 2) for m in slopes]
+  assert np.allclose(analyzer.get_ssr_by_slope(x, y, slopes), expected)
+  assert np.argmin(expected) == np.argmin(np.abs(slopes - np.polyfit(x, y, 1)[0]))
+
+def test_bootstrap_chunks_follow_element_budget(analyzer, linear_data):
+  from utils import Randomizer
+  x, y = linear_data(n=300, seed=5)
+  randomizer = Randomizer(2)
+  shapes = []
+  draw = randomizer.random_indices
+  randomizer.random_indices = lambda rows, size : shapes.append((rows, size)) or draw(rows, size)
+  fits = analyzer.sim_bootstrap(50, x, y, chunk_elements=3000, randomizer=randomizer)
+  assert fits.shape == (50, 3)
+  assert max(rows * size for rows, size in shapes) <= 3000
+  assert sum(rows for rows, size in shapes) == 50
+  shapes.clear()
+  analyzer.sim_bootstrap(3, x, y, chunk_elements=10, randomizer=randomizer)
+  assert shapes == [(1, 300)] * 3
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from analyze import DataSet
+
+def test_irls_matches_sklearn(analyzer, logistic_data):
+  x, y = logistic_data(p=3)
+  coefs = analyzer.logistic_irls(x, y)
+  reference = LogisticRegression(C=np.inf, tol=1e-10, max_iter=1000).fit(x, y)
+  assert np.allclose(coefs[:-1], reference.coef_[0], atol=1e-5)
+  assert np.isclose(coefs[-1], reference.intercept_[0], atol=1e-5)
+
+def test_auc_matches_sklearn(analyzer, modeller, logistic_data):
+  x, y = logistic_data(seed=1)
+  model = modeller.get_logistic(x[:, 0], y)
+  expected = roc_auc_score(y, model.predict(x[:, 0]))
+  assert np.isclose(analyzer.get_auc(model), expected)
+
+def test_auc_with_tied_scores(analyzer, modeller, logistic_data):
+  x, y = logistic_data(seed=2)
+  x = np.round(x[:, 0])
+  model = modeller.get_logistic(x, y)
+  assert np.isclose(analyzer.get_auc(model), roc_auc_score(y, model.predict(x)))
+
+def test_minibatch_model(analyzer, modeller, logistic_data):
+  x, y = logistic_data(n=3000, p=2, seed=3)
+  dataset = DataSet(pd.DataFrame({'a': x[:, 0], 'b': x[:, 1], 'y': y}))
+  model = modeller.gen_logistic_minibatch(lambda : dataset.get_chunks(500))
+  assert model is modeller.logistic(0)
+  reference = LogisticRegression(C=np.inf).fit(x, y)
+  assert np.allclose(model.get_coefs(), np.r_[reference.coef_[0], reference.intercept_], atol=0.1)
+  assert model.predict(x[:, 0]) is None
+  assert model.get_targets() is None
+  assert analyzer.get_auc(model) is None
+  assert analyzer.get_accuracy(model) is None
+  assert np.isclose(analyzer.get_auc(model, dataset=dataset), roc_auc_score(y, model.predict(x)))
+
+def test_metrics_match_sklearn(analyzer, modeller, logistic_data):
+  from sklearn.metrics import confusion_matrix
+  x, y = logistic_data(seed=5)
+  model = modeller.get_logistic(x[:, 0], y)
+  predicted = model.predict(x[:, 0]) > 0.5
+  (tn, fp), (fn, tp) = confusion_matrix(y > 0.5, predicted)
+  metrics = analyzer.get_metrics(model)
+  assert metrics.get_confusion_matrix() == [[tp, fp], [fn, tn]]
+  assert np.isclose(analyzer.get_precision(model), tp / (tp + fp))
+  assert np.isclose(analyzer.get_specificity(model), tn / (tn + fp))
+
+def test_metrics_follow_model_version(analyzer, modeller, logistic_data):
+  x, y = logistic_data(seed=6)
+  model = modeller.get_logistic(x[:, 0], y)
+  metrics = analyzer.get_metrics(model)
+  assert analyzer.get_metrics(model) is metrics
+  assert analyzer.get_metrics(model, 0.7) is not metrics
+  model.set_coefs(-model.get_coefs())
+  refit = analyzer.get_metrics(model)
+  assert refit is not metrics
+  assert refit.get_tp() == metrics.get_fn()
+
+def test_roc_matches_sklearn(analyzer, modeller, logistic_data):
+  from sklearn.metrics import roc_curve
+  x, y = logistic_data(seed=7)
+  x = np.round(x[:, 0], 1)
+  model = modeller.get_logistic(x, y)
+  fpr, tpr, thresholds = analyzer.get_roc(model)
+  expected_fpr, expected_tpr, _ = roc_curve(y, model.predict(x), drop_intermediate=False)
+  assert np.allclose(fpr, expected_fpr)
+  assert np.allclose(tpr, expected_tpr)
+
+def test_binned_auc_is_close(analyzer, modeller, logistic_data):
+  x, y = logistic_data(n=5000, seed=8)
+  model = modeller.get_logistic(x[:, 0], y)
+  expected = roc_auc_score(y, model.predict(x[:, 0]))
+  assert abs(analyzer.get_auc(model, bins=512) - expected) < 2e-3
+
+def test_r_sq_on_scaled_step(analyzer, modeller):
+  rng = np.random.default_rng(9)
+  x = np.sort(rng.uniform(0, 100, 400))
+  # A 0/50 step with a short noisy transition, so the fit stays finite.
+  y = 50.0 * (x + rng.normal(scale=0.5, size=400) > 50)
+  model = modeller.get_logistic(x, y)
+  assert analyzer.get_r_sq(model) > 0.95
+  assert np.allclose(model.get_targets(), y / 50)
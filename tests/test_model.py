@@ -0,0 +1,27 @@
+import os
+import numpy as np
+import config as g
+
+def test_export_renders_once(modeller, workspace):
+  (workspace / os.path.dirname(g.files['least-squares'])).mkdir(exist_ok=True)
+  rng = np.random.default_rng(0)
+  x = rng.normal(size=50)
+  model = modeller.gen_least_squares(x, 2 * x + rng.normal(size=50))
+  assert not model.is_exported()
+  filename = model.export()
+  assert filename == g.files['least-squares']
+  assert os.path.exists(filename)
+  assert model.is_exported()
+  assert model.export() == filename
+  model.set_coefs([1.0, 0.0])
+  assert not model.is_exported()
+
+def test_predict_matches_coefficients(modeller):
+  rng = np.random.default_rng(1)
+  x = rng.normal(size=40)
+  model = modeller.gen_least_squares(x, 3 * x + 1)
+  assert np.allclose(model.predict(x), 3 * x + 1)
+  assert np.isclose(model.at(2.0), 7.0)
+  curve_x, curve_y = model.get_curve()
+  assert curve_x[0] == x.min() and curve_x[-1] == x.max()
+  assert np.allclose(curve_y, 3 * curve_x + 1)
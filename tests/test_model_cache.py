@@ -0,0 +1,47 @@
+import os
+import numpy as np
+from utils import ModelCache
+
+def test_key_depends_on_type_params_and_data():
+  cache = ModelCache()
+  x = np.arange(10.0)
+  y = 2 * x
+  key = cache.get_key('RidgeModel', (50,), x, y)
+  assert key == cache.get_key('RidgeModel', (50,), x.copy(), list(y))
+  assert key != cache.get_key('LassoModel', (50,), x, y)
+  assert key != cache.get_key('RidgeModel', (60,), x, y)
+  assert key != cache.get_key('RidgeModel', (50,), x, y + 1e-12)
+  assert key != cache.get_key('RidgeModel', (50,), x.reshape(5, 2), y)
+
+def test_memory_bound_falls_back_to_disk():
+  cache = ModelCache(capacity=2)
+  for i in range(4):
+    cache.put(str(i), [i, i + 1.0])
+  assert list(cache.entries) == ['2', '3']
+  assert np.array_equal(cache.get('0'), [0, 1.0])
+
+def test_disk_bound_evicts_least_recent():
+  cache = ModelCache()
+  cache.put('a', [1.0])
+  size = cache.get_size()
+  cache = ModelCache(disk_capacity=3 * size)
+  assert cache.get_size() == size
+  for key in 'bc':
+    cache.put(key, [1.0])
+  cache.get('a')
+  for key in 'de':
+    cache.put(key, [1.0])
+  assert sorted(os.listdir(cache.folder)) == ['a.npy', 'd.npy', 'e.npy']
+  assert cache.get_size() == 3 * size
+  assert ModelCache(disk_capacity=size).get_size() == size
+  assert sorted(os.listdir(cache.folder)) == ['e.npy']
+
+def test_model_lists_are_not_trimmed(modeller):
+  rng = np.random.default_rng(0)
+  for i in range(40):
+    x = rng.normal(size=20)
+    modeller.get_ridge(x, 2 * x + rng.normal(size=20))
+  assert [model.get_index() for model in modeller.ridge_models] == list(range(1, 41))
+  x = modeller.ridge_models[0].get_training_x()
+  y = modeller.ridge_models[0].get_training_y()
+  assert modeller.get_ridge(x, y) is modeller.ridge_models[0]
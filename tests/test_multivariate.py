@@ -0,0 +1,34 @@
+import numpy as np
+
+def lstsq(x, y):
+  design = np.column_stack([x, np.ones(len(x))])
+  return np.linalg.lstsq(design, y, rcond=None)[0]
+
+def test_chunked_qr_matches_lstsq(analyzer, linear_data):
+  x, y = linear_data(n=1000, p=4, offset=1e4)
+  for chunk_size in [37, 250, 5000]:
+    coefs, yint, r_sq, variance = analyzer.multivariate_least_squares(x, y, chunk_size)
+    expected = lstsq(x, y)
+    assert np.allclose(coefs, expected[:-1], rtol=1e-7)
+    assert np.isclose(yint, expected[-1], rtol=1e-6)
+    resid = y - np.column_stack([x, np.ones(len(x))]) @ expected
+    assert np.isclose(variance, np.sum(resid ** 2) / (len(x) - 5))
+    assert np.isclose(r_sq, 1 - np.sum(resid ** 2) / np.sum((y - y.mean()) ** 2))
+
+def test_several_responses(analyzer, linear_data):
+  x, y = linear_data(n=1000, p=4, seed=1, offset=1e4)
+  # Further responses share the design but not the coefficients.
+  y = np.column_stack([y, x @ [1.0, 2.0, 0.0, -1.0], x[:, 2] - y])
+  coefs, yints, r_sq, variance = analyzer.multivariate_least_squares(x, y, 100)
+  expected = lstsq(x, y)
+  assert coefs.shape == (4, 3)
+  assert np.allclose(coefs, expected[:-1], rtol=1e-7)
+  assert np.allclose(yints, expected[-1], rtol=1e-6)
+
+def test_dependent_columns(analyzer, linear_data):
+  x, y = linear_data(n=1000, p=4, seed=2, offset=1e4)
+  x[:, 3] = x[:, 0] + x[:, 1]
+  assert analyzer.multivariate_least_squares(x, y) == None
+  x = x - 1e4
+  x[:, 3] = x[:, 0] - 2 * x[:, 2]
+  assert analyzer.multivariate_least_squares(x, y) == None
@@ -0,0 +1,20 @@
+import numpy as np
+from sklearn.linear_model import Ridge
+
+def test_ridge_path_matches_sklearn(analyzer, linear_data):
+  x, y = linear_data(n=300, p=6, offset=10, correlated=True)
+  lambdas, coefs, yints, gcv = analyzer.ridge_path(x, y, lambdas=[0.01, 1.0, 50.0, 2000.0])
+  for lam, b, a in zip(lambdas, coefs, yints):
+    reference = Ridge(alpha=lam).fit(x, y)
+    assert np.allclose(b, reference.coef_, atol=1e-8)
+    assert np.isclose(a, reference.intercept_, atol=1e-6)
+
+def test_ridge_gcv_matches_leave_one_out_form(analyzer, linear_data):
+  x, y = linear_data(n=80, p=3, seed=1, offset=10, correlated=True)
+  lambdas, coefs, yints, gcv = analyzer.ridge_path(x, y, lambdas=[0.5, 20.0])
+  x_c = x - x.mean(axis=0)
+  for lam, b, a, score in zip(lambdas, coefs, yints, gcv):
+    hat = x_c @ np.linalg.solve(x_c.T @ x_c + lam * np.eye(3), x_c.T)
+    dof = np.trace(hat) + 1
+    ss_res = np.sum((y - x @ b - a) ** 2)
+    assert np.isclose(score, (ss_res / len(y)) / (1 - dof / len(y)) ** 2)
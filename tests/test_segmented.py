@@ -0,0 +1,53 @@
+import itertools
+import numpy as np
+import config as g
+
+def ss_res(x, y):
+  if np.ptp(x) == 0:
+    return np.sum((y - y.mean()) ** 2)
+  return np.sum((y - np.polyval(np.polyfit(x, y, 1), x)) ** 2)
+
+def exhaustive(x, y, segments, min_size):
+  # Every placement of breaks between distinct x with min_size points apart.
+  n = len(x)
+  splits = [i for i in range(1, n) if x[i] > x[i - 1]]
+  best = np.inf
+  for cuts in itertools.combinations(splits, segments - 1):
+    bounds = [0, *cuts, n]
+    if min(np.diff(bounds)) < min_size:
+      continue
+    best = min(best, sum(ss_res(x[a:b], y[a:b]) for a, b in zip(bounds, bounds[1:])))
+  return best
+
+def costs_from_bic(bic, n):
+  counts = np.arange(1, len(bic) + 1)
+  return n * np.exp((bic - (3 * counts - 1) * np.log(n)) / n)
+
+def test_matches_exhaustive_search(analyzer, monkeypatch):
+  # Small blocks, so each DP layer is split across several of them.
+  monkeypatch.setattr(g, 'segmented_block_size', 50)
+  for seed in range(4):
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.integers(0, 30, 36).astype(float))
+    y = np.where(x < 12, x, 24 - x) + rng.normal(size=36)
+    breaks, coefs, bic = analyzer.segmented_fit(x, y, max_segments=3, min_size=5)
+    costs = costs_from_bic(bic, len(x))
+    for k in range(1, 4):
+      assert np.isclose(costs[k - 1], exhaustive(x, y, k, 5), rtol=1e-8)
+
+def test_recovers_breakpoint(analyzer):
+  rng = np.random.default_rng(9)
+  x = rng.uniform(0, 10, 400) + 2000
+  y = np.where(x < 2004, 2 * (x - 2000), 8 - 3 * (x - 2004)) + 0.1 * rng.normal(size=400)
+  breaks, coefs, bic = analyzer.segmented_fit(x, y, max_segments=4, min_size=10)
+  assert len(breaks) == 1
+  assert abs(breaks[0] - 2004) < 0.1
+  assert np.allclose(coefs[:, 0], [2, -3], atol=0.05)
+
+def test_single_breakpoint_by_default(analyzer):
+  rng = np.random.default_rng(2)
+  x = rng.uniform(0, 100, 200000)
+  y = np.abs(x - 40) + rng.normal(size=200000)
+  breaks, coefs, bic = analyzer.segmented_fit(x, y)
+  assert len(bic) == g.segmented_max_segments == 2
+  assert abs(breaks[0] - 40) < 0.5
@@ -0,0 +1,37 @@
+import numpy as np
+from scipy import stats
+from utils import Randomizer
+
+def test_f_scores_match_per_trial_fits(analyzer):
+  rng = np.random.default_rng(0)
+  x = rng.integers(0, 100, (20, 25)).astype(float)
+  y = rng.integers(0, 100, (20, 25)).astype(float)
+  f_scores = analyzer.get_f_scores(x, y)
+  for row in range(20):
+    fit = np.polyval(np.polyfit(x[row], y[row], 1), x[row])
+    ss_fit = np.sum((y[row] - fit) ** 2)
+    ss_mean = np.sum((y[row] - y[row].mean()) ** 2)
+    assert np.isclose(f_scores[row], (ss_mean - ss_fit) / (ss_fit / 23))
+
+def test_simulated_f_scores_follow_f_distribution(analyzer):
+  f_scores = analyzer.sim_f_scores(20000, chunk_size=3000, randomizer=Randomizer(1))
+  assert len(f_scores) == 20000
+  assert stats.kstest(f_scores, stats.f(1, 23).cdf).pvalue > 1e-3
+
+def test_sharded_runs_are_reproducible(analyzer):
+  first = analyzer.sim_f_scores(3000, workers=2, seed=7)
+  second = analyzer.sim_f_scores(3000, workers=2, seed=7)
+  assert len(first) == 3000
+  assert np.array_equal(first, second)
+  assert not np.array_equal(first, analyzer.sim_f_scores(3000, workers=2, seed=8))
+
+def test_sharded_bootstrap(analyzer):
+  rng = np.random.default_rng(3)
+  x = rng.normal(size=100)
+  y = x + rng.normal(size=100)
+  fits = analyzer.sim_bootstrap(1000, x, y, workers=2, seed=1)
+  assert fits.shape == (1000, 3)
+  assert np.array_equal(fits, analyzer.sim_bootstrap(1000, x, y, workers=2, seed=1))
+
+def test_f_scores_need_more_points_than_parameters(analyzer):
+  assert len(analyzer.get_f_scores(np.ones((3, 2)), np.ones((3, 2)))) == 0
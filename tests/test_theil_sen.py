@@ -0,0 +1,56 @@
+import numpy as np
+import config as g
+
+def brute_slope(x, y):
+  i, j = np.triu_indices(len(x), 1)
+  dx = x[j] - x[i]
+  slopes = (y[j] - y[i])[dx != 0] / dx[dx != 0]
+  return np.median(slopes)
+
+def check(analyzer, x, y):
+  slope, yint = analyzer.theil_sen_slope_yint_eqn(x, y)[:2]
+  expected = brute_slope(x, y)
+  assert np.isclose(slope, expected, rtol=1e-9, atol=1e-12)
+  assert np.isclose(yint, np.median(y - expected * x), rtol=1e-9, atol=1e-9)
+
+def test_continuous(analyzer):
+  rng = np.random.default_rng(1)
+  x = rng.normal(size=3000)
+  check(analyzer, x, 2 * x + rng.normal(size=3000))
+
+def test_small_integer_data(analyzer):
+  for seed in range(20):
+    rng = np.random.default_rng(seed)
+    x = rng.integers(0, 20, 286).astype(float)
+    y = rng.integers(0, 20, 286).astype(float)
+    check(analyzer, x, y)
+
+def test_three_level_response(analyzer):
+  for seed in range(3):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=3000)
+    check(analyzer, x, rng.integers(0, 3, 3000).astype(float))
+
+def test_rounded_response(analyzer):
+  rng = np.random.default_rng(7)
+  x = rng.integers(0, 50, 2000).astype(float)
+  check(analyzer, x, np.round(0.37 * x + rng.normal(size=2000)))
+
+def test_few_distinct_slopes(analyzer):
+  rng = np.random.default_rng(3)
+  x = rng.integers(0, 7, 2500).astype(float)
+  check(analyzer, x, x / 3 + rng.integers(0, 2, 2500))
+
+def test_fallback_matches(analyzer):
+  rng = np.random.default_rng(5)
+  x = rng.integers(0, 20, 1500).astype(float)
+  y = rng.integers(0, 20, 1500).astype(float)
+  rounds = g.theil_sen_max_rounds
+  g.theil_sen_max_rounds = 0
+  try:
+    check(analyzer, x, y)
+  finally:
+    g.theil_sen_max_rounds = rounds
+
+def test_constant_x(analyzer):
+  assert analyzer.theil_sen_slope_yint_eqn(np.ones(10), np.arange(10.0)) == None
@@ -0,0 +1,117 @@
+import numpy as np
+import config as g
+from utils import RenderCache
+from visualize import Buffer
+from visualize import Plotter
+from visualize import ScatterSketch
+from visualize import SmoothSketch
+
+def test_buffer_keeps_a_view_until_append():
+  vals = np.arange(5.0)
+  buffer = Buffer()
+  buffer.extend(vals)
+  assert np.shares_memory(buffer.get(), vals)
+  buffer.extend([5, 6])
+  assert not np.shares_memory(buffer.get(), vals)
+  assert np.array_equal(buffer.get(), np.arange(7.0))
+  assert np.array_equal(vals, np.arange(5.0))
+
+def test_buffer_converts_other_dtypes():
+  buffer = Buffer()
+  buffer.extend([1, 2, 3])
+  assert buffer.get().dtype == np.float64
+  ints = np.arange(4)
+  buffer = Buffer()
+  buffer.extend(ints)
+  assert not np.shares_memory(buffer.get(), ints)
+
+def test_buffer_growth():
+  buffer = Buffer()
+  expected = []
+  for i in range(100):
+    buffer.extend(np.arange(i))
+    expected.extend(range(i))
+  assert len(buffer) == len(expected)
+  assert np.array_equal(buffer.get(), expected)
+
+def test_render_key_follows_viewed_data(workspace):
+  # The key and the pixels both come from the viewed array at save time.
+  g.render_cache = RenderCache()
+  x = np.arange(10.0)
+  y = x ** 2
+  plotter = Plotter()
+  plotter.set_output_filename('a.png')
+  sketch = ScatterSketch()
+  sketch.add_x(x)
+  sketch.add_y(y)
+  plotter.load([sketch])
+  key = plotter.get_key()
+  y[3] = -1
+  assert plotter.get_key() != key
+  y[3] = 9
+  assert plotter.get_key() == key
+
+def make_plotter(filename, y, title='t'):
+  plotter = Plotter()
+  plotter.set_title(title)
+  plotter.set_output_filename(filename)
+  sketch = ScatterSketch()
+  sketch.add_x(np.arange(len(y)))
+  sketch.add_y(y)
+  plotter.load([sketch])
+  return plotter
+
+def test_render_key_tracks_content():
+  g.render_cache = RenderCache()
+  y = np.arange(10.0)
+  key = make_plotter('a.png', y).get_key()
+  assert make_plotter('b.png', y.copy()).get_key() == key
+  assert make_plotter('a.png', y, title='u').get_key() != key
+  assert make_plotter('a.png', y + 1e-9).get_key() != key
+
+def test_render_cache_serves_and_evicts(workspace):
+  g.render_cache = RenderCache()
+  first = make_plotter('a.png', np.arange(10.0))
+  first.save()
+  assert g.render_cache.get_size() > 0
+  second = make_plotter('b.png', np.arange(10.0))
+  assert second.load_cached(second.get_key())
+  assert (workspace / 'b.png').read_bytes() == (workspace / 'a.png').read_bytes()
+  # Room for only one more render, so the earlier one goes.
+  g.render_cache = None
+  make_plotter('c.png', np.arange(5.0)).save()
+  capacity = (workspace / 'c.png').stat().st_size
+  g.render_cache = RenderCache(capacity=capacity)
+  make_plotter('c.png', np.arange(5.0)).save()
+  assert g.render_cache.get_size() == capacity
+  assert not second.load_cached(second.get_key())
+
+def test_decimation_keeps_each_column_extremes():
+  rng = np.random.default_rng(0)
+  x = np.sort(rng.uniform(0, 1, 100000))
+  y = np.cumsum(rng.normal(size=100000))
+  sketch = SmoothSketch()
+  sketch.add_x(x)
+  sketch.add_y(y)
+  x_kept, y_kept = sketch.get_decimated(400)
+  assert len(x_kept) <= 400
+  assert np.all(np.diff(x_kept) >= 0)
+  columns = np.minimum(((x - x[0]) / (x[-1] - x[0]) * 100).astype(int), 99)
+  kept_columns = np.minimum(((x_kept - x[0]) / (x[-1] - x[0]) * 100).astype(int), 99)
+  for col in range(100):
+    assert y_kept[kept_columns == col].max() == y[columns == col].max()
+    assert y_kept[kept_columns == col].min() == y[columns == col].min()
+
+def test_save_all_in_spawned_workers(workspace, monkeypatch):
+  # What macOS gets; the worker must not depend on a forked config.
+  import multiprocessing
+  import visualize
+  monkeypatch.setattr(visualize, 'get_process_context', lambda : multiprocessing.get_context('spawn'))
+  monkeypatch.setattr(visualize.os, 'cpu_count', lambda : 2)
+  monkeypatch.setattr(g, 'scatter_max_points', 5)
+  plotters = [make_plotter(f'{name}.png', np.arange(10.0) * i) for i, name in enumerate('ab')]
+  assert visualize.save_all(plotters, 2) == ['a.png', 'b.png']
+  serial = [make_plotter(f'{name}.png', np.arange(10.0) * i) for i, name in enumerate('cd')]
+  visualize.save_all(serial, 1)
+  for name, other in zip('ab', 'cd'):
+    assert (workspace / f'{name}.png').read_bytes() == (workspace / f'{other}.png').read_bytes()
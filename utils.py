@@ -2,16 +2,38 @@ import math
 import random
 import config as g
 import os
+import sys
+import hashlib
+import shutil
+import multiprocessing
+import numpy as np
+from collections import OrderedDict
 from PIL import Image
 
+def get_process_context():
+  # Fork on Linux, where it is cheap and the children inherit config as is.
+  # Elsewhere (macOS with Tk loaded) forking is unsafe, so workers are
+  # spawned: main.py is import-safe and the tasks ship the settings they read.
+  if sys.platform.startswith('linux'):
+    return multiprocessing.get_context('fork')
+  return multiprocessing.get_context('spawn')
+
 class Randomizer(object):
-  def __init__(self):
+  def __init__(self, seed=None):
     random.seed()
+    self.rng = np.random.default_rng(seed)
   def random_list(self, size, lower, upper):
     data = []
     for i in range(size):
       data.append(random.randint(lower, upper))
     return data
+  def random_matrix(self, rows, cols, lower, upper):
+    # Same inclusive bounds as random_list, one row per trial.
+    return self.rng.integers(lower, upper, size=(rows, cols), endpoint=True)
+  def random_indices(self, rows, size):
+    return self.rng.integers(0, size, size=(rows, size))
+  def permutation_matrix(self, rows, vals):
+    return self.rng.permuted(np.tile(vals, (rows, 1)), axis=1)
 
 class Math(object):
     def __init__(self):
@@ -48,7 +70,7 @@ class ImageManager(object):
         img = Image.open(file_in)
         hpercent = (baseheight / float(img.size[1]))
         wsize = int((float(img.size[0]) * float(hpercent)))
-        img = img.resize((wsize, baseheight), Image.ANTIALIAS)
+        img = img.resize((wsize, baseheight), Image.LANCZOS)
         img.save(file_out)
         self.debug.prn(self, f'{file_in} scaled by {baseheight} to {file_out}.')
 
@@ -68,4 +90,129 @@ class OutputFileFormatter(object):
         self.format_file(f'{folder}/{file}')
       g.debug.prn(self, f'Folder {folder} formatted.')
     else:
-      g.debug.prn(self, f'Folder {folder} does not exist.', 1)
\ No newline at end of file
+      g.debug.prn(self, f'Folder {folder} does not exist.', 1)
+
+class ModelCache(object):
+  # Fitted coefficients by content hash: the most recent few in memory, and
+  # a copy on disk bounded by total size, evicted least recently used first.
+  def __init__(self, capacity=None, folder=None, disk_capacity=None):
+    self.capacity = g.model_cache_size if capacity == None else capacity
+    self.folder = g.model_cache_folder if folder == None else folder
+    self.disk_capacity = g.model_cache_bytes if disk_capacity == None else disk_capacity
+    self.entries = OrderedDict()
+    self.files = OrderedDict()
+    self.size = 0
+    if os.path.exists(self.folder):
+      for entry in sorted(os.scandir(self.folder), key=lambda entry: entry.stat().st_mtime):
+        if entry.name.endswith('.npy'):
+          self.files[entry.name[:-4]] = entry.stat().st_size
+          self.size += entry.stat().st_size
+      self.evict()
+    g.debug.prn(self, 'ModelCache object created.')
+  def class_name(self):
+    return 'ModelCache'
+  def get_key(self, model_type, params, *arrays):
+    digest = hashlib.sha1(f'{model_type}:{params!r}'.encode())
+    for vals in arrays:
+      vals = np.ascontiguousarray(vals, dtype=np.float64)
+      digest.update(str(vals.shape).encode())
+      digest.update(vals.data)
+    return digest.hexdigest()
+  def get_path(self, key):
+    return f'{self.folder}/{key}.npy'
+  def get_size(self):
+    return self.size
+  def get(self, key):
+    if key in self.entries:
+      self.entries.move_to_end(key)
+      if key in self.files:
+        self.files.move_to_end(key)
+      g.debug.prn(self, f'Cache hit for {key}.')
+      return self.entries[key]
+    if not key in self.files:
+      return None
+    path = self.get_path(key)
+    if not os.path.exists(path):
+      self.size -= self.files.pop(key)
+      return None
+    self.store(key, np.load(path))
+    os.utime(path)
+    self.files.move_to_end(key)
+    g.debug.prn(self, f'Cache hit for {key} on disk.')
+    return self.entries[key]
+  def put(self, key, vals):
+    vals = np.asarray(vals, dtype=np.float64)
+    self.store(key, vals)
+    if key in self.files:
+      self.size -= self.files.pop(key)
+    os.makedirs(self.folder, exist_ok=True)
+    np.save(self.get_path(key), vals)
+    self.files[key] = os.path.getsize(self.get_path(key))
+    self.size += self.files[key]
+    self.evict()
+    g.debug.prn(self, f'Cached {key}.')
+  def store(self, key, vals):
+    self.entries[key] = vals
+    self.entries.move_to_end(key)
+    while len(self.entries) > self.capacity:
+      self.entries.popitem(last=False)
+  def evict(self):
+    while self.size > self.disk_capacity and len(self.files) > 0:
+      key, size = self.files.popitem(last=False)
+      self.size -= size
+      if os.path.exists(self.get_path(key)):
+        os.remove(self.get_path(key))
+
+class RenderCache(object):
+  # Rendered images by content hash, bounded by their total size on disk.
+  # Kept outside imgs/ so format_folder() at startup does not wipe it.
+  def __init__(self, capacity=None, folder=None):
+    self.capacity = g.render_cache_bytes if capacity == None else capacity
+    self.folder = g.render_cache_folder if folder == None else folder
+    self.entries = OrderedDict()
+    self.size = 0
+    if os.path.exists(self.folder):
+      # Oldest first, so earlier sessions' use carries over to the LRU order.
+      for entry in sorted(os.scandir(self.folder), key=lambda entry: entry.stat().st_mtime):
+        if entry.name.endswith('.png'):
+          self.entries[entry.name[:-4]] = entry.stat().st_size
+          self.size += entry.stat().st_size
+      self.evict()
+    g.debug.prn(self, 'RenderCache object created.')
+  def class_name(self):
+    return 'RenderCache'
+  def get_path(self, key):
+    return f'{self.folder}/{key}.png'
+  def get_size(self):
+    return self.size
+  def get(self, key, filename):
+    if not key in self.entries:
+      return False
+    path = self.get_path(key)
+    if not os.path.exists(path):
+      self.size -= self.entries.pop(key)
+      return False
+    shutil.copyfile(path, filename)
+    os.utime(path)
+    self.entries.move_to_end(key)
+    g.debug.prn(self, f'{filename} served from render {key}.')
+    return True
+  def put(self, key, filename):
+    size = os.path.getsize(filename)
+    if size > self.capacity:
+      g.debug.prn(self, f'{filename} is larger than the render cache.', 1)
+      return
+    if key in self.entries:
+      self.size -= self.entries.pop(key)
+    os.makedirs(self.folder, exist_ok=True)
+    shutil.copyfile(filename, self.get_path(key))
+    self.entries[key] = size
+    self.size += size
+    self.evict()
+    g.debug.prn(self, f'Cached render {key}.')
+  def evict(self):
+    while self.size > self.capacity and len(self.entries) > 0:
+      key, size = self.entries.popitem(last=False)
+      self.size -= size
+      if os.path.exists(self.get_path(key)):
+        os.remove(self.get_path(key))
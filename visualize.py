@@ -3,43 +3,87 @@ import tempfile
 os.environ['MPLCONFIGDIR'] = tempfile.mkdtemp()
 import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
 import math
+import hashlib
 import numpy as np
 import config as g
+from concurrent.futures import ProcessPoolExecutor
 
 from utils import Debugger
+from utils import ImageManager
+from utils import get_process_context
+
+def _render_worker(task):
+  # A spawned child starts from config's defaults, so the settings travel along.
+  plotter, settings = task
+  for name, val in settings.items():
+    setattr(g, name, val)
+  plotter.render()
+  return plotter.get_output_filename()
+
+def save_all(plotters, workers=1):
+  # Each Plotter owns its figure, so independent plots can render in parallel.
+  # The render cache is only touched here, in the calling process.
+  keys = [plotter.get_key() for plotter in plotters]
+  pending = [(plotter, key) for plotter, key in zip(plotters, keys) if not plotter.load_cached(key)]
+  workers = min(workers, len(pending), os.cpu_count() or 1)
+  if workers > 1:
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context()) as pool:
+      settings = {name: getattr(g, name) for name in g.render_settings}
+      list(pool.map(_render_worker, [(plotter, settings) for plotter, key in pending]))
+  else:
+    for plotter, key in pending:
+      plotter.render()
+  for plotter, key in pending:
+    plotter.store_cached(key)
+  return [plotter.get_output_filename() for plotter in plotters]
 
 class Plotter(object):
+  # Only records what to draw; a Figure on its own Agg canvas is built per
+  # save, so no pyplot state is shared between plots.
   def __init__(self):
     self.debug = Debugger()
-    self._set_axes()
+    self.title = None
     self._set_labels()
     self.sketches = []
     self.filename = g.files['plot']
+    self.height = None
     self.debug.prn(self, 'Plotter object created.')
   def class_name(self):
     return 'Plotter'
-  def _set_axes(self):
-    plt.axhline(0, color=g.x_clr)
-    plt.axvline(0, color=g.y_clr)
+  def _set_axes(self, ax):
+    ax.axhline(0, color=g.x_clr)
+    ax.axvline(0, color=g.y_clr)
     self.debug.prn(self, 'Axes drawn.', 3)
   def set_x_axis_label(self, x_label):
-    plt.xlabel(x_label)
+    self.x_label = x_label
   def set_y_axis_label(self, y_label):
-    plt.ylabel(y_label)
+    self.y_label = y_label
   def set_axis_labels(self, x_label, y_label):
-    plt.xlabel(x_label)
-    plt.ylabel(y_label)
+    self.x_label = x_label
+    self.y_label = y_label
   def _set_labels(self):
-    plt.xlabel(g.x_lbl)
-    plt.ylabel(g.y_lbl)
+    self.x_label = g.x_lbl
+    self.y_label = g.y_lbl
     self.debug.prn(self, 'Labels set.', 3)
   def set_output_filename(self, filename):
     self.filename = filename
     self.debug.prn(self, 'Filename set.')
+  def get_output_filename(self):
+    return self.filename
+  def set_output_height(self, height):
+    # The saved image is scaled to this height; None keeps matplotlib's size.
+    self.height = height
+  def get_output_height(self):
+    return self.height
   def set_title(self, title):
-    plt.title(title)
+    self.title = title
     self.debug.prn(self, 'Title set.')
+  def get_title(self):
+    return self.title
   def get_sketches(self):
     return self.sketches
   def load(self, sketches):
@@ -52,51 +96,128 @@ class Plotter(object):
       self.debug.prn(self, 'Sketch loaded.')
     else:
       self.debug.prn(self, 'load() takes either a Sketch or a list', 1)
-  def _plot(self):
+  def _plot(self, figure):
+    ax = figure.add_subplot()
+    self._set_axes(ax)
+    ax.set_xlabel(self.x_label)
+    ax.set_ylabel(self.y_label)
+    if self.title != None:
+      ax.set_title(self.title)
     for sketch in self.sketches:
-      sketch.plot()
+      sketch.plot(ax)
   def show(self):
-    self._plot()
+    # An interactive window is the one place pyplot is still needed.
+    self._plot(plt.figure())
     plt.show()
+  def get_key(self):
+    # Everything that decides the pixels: sketch types and data, title,
+    # labels, size and the drawing settings.
+    if g.render_cache == None:
+      return None
+    settings = (self.title, self.x_label, self.y_label, self.height, g.x_clr, g.y_clr,
+                g.smooth_max_points, g.scatter_max_points, g.hexbin_gridsize, matplotlib.__version__)
+    digest = hashlib.sha1(repr(settings).encode())
+    for sketch in self.sketches:
+      sketch.update_digest(digest)
+    return digest.hexdigest()
+  def load_cached(self, key):
+    return key != None and g.render_cache.get(key, self.filename)
+  def store_cached(self, key):
+    if key != None:
+      g.render_cache.put(key, self.filename)
   def save(self):
-    self._plot()
-    plt.savefig(self.filename)
+    key = self.get_key()
+    if self.load_cached(key):
+      self.debug.prn(self, f'{self.filename} served from the render cache.')
+      return
+    self.render()
+    self.store_cached(key)
+  def render(self):
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    self._plot(figure)
+    figure.savefig(self.filename)
+    if self.height != None:
+      ImageManager().scale(self.filename, self.filename, self.height)
+    self.debug.prn(self, f'Saved {self.filename}.')
   def close(self):
-    plt.close()
     self.debug.prn(self, 'Plot closed.')
 
+class Buffer(object):
+  # Growable float64 array. Capacity doubles, so appends are amortized O(1).
+  # An array given to an empty buffer is kept as a view, not copied, until
+  # something is appended after it. The render key is hashed from the same
+  # buffer at save time, so later edits by the caller move key and pixels
+  # together.
+  def __init__(self):
+    self.data = np.empty(0)
+    self.size = 0
+    self.owned = False
+  def class_name(self):
+    return 'Buffer'
+  def __len__(self):
+    return self.size
+  def extend(self, vals):
+    vals = np.asarray(vals, dtype=np.float64).ravel()
+    if self.size == 0:
+      self.data = vals
+      self.size = len(vals)
+      self.owned = False
+      return
+    self.reserve(self.size + len(vals))
+    self.data[self.size:self.size + len(vals)] = vals
+    self.size += len(vals)
+  def reserve(self, size):
+    if self.owned and size <= len(self.data):
+      return
+    data = np.empty(max(size, 2 * len(self.data), 16))
+    data[:self.size] = self.data[:self.size]
+    self.data = data
+    self.owned = True
+  def get(self):
+    return self.data[:self.size]
+
 class Sketch(object):
   def __init__(self):
     self.debug = Debugger()
-    self.x = []
-    self.y = []
+    self.x = Buffer()
+    self.y = Buffer()
   def class_name(self):
     return 'Sketch'
+  def _extend(self, buffer, vals, name):
+    try:
+      buffer.extend(vals)
+    except (TypeError, ValueError):
+      self.debug.prn(self, f'Incorrect type passed to add_{name}()', 1)
+      return
+    self.debug.prn(self, f'Added {name}-vals.')
   def add_x(self, x):
-    if type(x) == list:
-      for v in x:
-        self.x.append(v)
-      self.debug.prn(self, 'Added x-vals.')
-    elif type(x) == int or type(x) == np.float64:
-      self.x.append(x)
-      self.debug.prn(self, 'Added x-val.')
-    else:
-      self.debug.prn(self, 'Incorrect type passed to add_x()', 1)
-      print(type(x))
+    self._extend(self.x, x, 'x')
   def get_x(self):
-    return self.x
+    return self.x.get()
   def add_y(self, y):
-    for v in y:
-      self.y.append(v)
-    self.debug.prn(self, 'Added y-vals.')
+    self._extend(self.y, y, 'y')
   def get_y(self):
-    return self.y
+    return self.y.get()
   def add(self, c):
-    for x,y in c:
-      self.x.append(x)
-      self.y.append(y)
+    coords = np.asarray(c, dtype=np.float64).reshape(-1, 2)
+    self.x.extend(coords[:, 0])
+    self.y.extend(coords[:, 1])
     self.debug.prn(self, 'Added coords.')
-  def plot(self):
+  def update_digest(self, digest):
+    # Data buffers are hashed by content; other attributes by their repr.
+    digest.update(self.class_name().encode())
+    for name, val in sorted(vars(self).items()):
+      if name == 'debug':
+        continue
+      digest.update(name.encode())
+      if isinstance(val, Buffer):
+        vals = np.ascontiguousarray(val.get())
+        digest.update(str(len(vals)).encode())
+        digest.update(vals.data)
+      else:
+        digest.update(repr(val).encode())
+  def plot(self, ax):
     self.debug.prn(self, 'Cannot call plot() on abstract Sketch.', 1)
 
 class ScatterSketch(Sketch):
@@ -104,10 +225,15 @@ class ScatterSketch(Sketch):
     super().__init__()
   def class_name(self):
     return 'ScatterSketch'
-  def plot(self):
+  def plot(self, ax):
     if len(self.x) == len(self.y):
-      plt.scatter(self.x, self.y)
-      self.debug.prn(self, 'Sketch drawn.')
+      if len(self.x) > g.scatter_max_points:
+        # Past this many markers only the density is readable.
+        ax.hexbin(self.get_x(), self.get_y(), gridsize=g.hexbin_gridsize, bins='log', mincnt=1)
+        self.debug.prn(self, 'Sketch drawn as hexbin density.')
+      else:
+        ax.scatter(self.get_x(), self.get_y())
+        self.debug.prn(self, 'Sketch drawn.')
     else:
       self.debug.prn(self, f'x({len(self.x)}) and y({len(self.y)}) must be of same length.', 1)
 
@@ -116,10 +242,36 @@ class SmoothSketch(Sketch):
     super().__init__()
   def class_name(self):
     return 'SmoothSketch'
-  def plot(self):
+  def get_decimated(self, max_points=None):
+    # Min/max per x column, plus each column's first and last point, so
+    # spikes and the line's path through a column both survive. O(n).
+    if max_points == None:
+      max_points = g.smooth_max_points
+    x = self.get_x()
+    y = self.get_y()
+    n = len(x)
+    columns = max_points // 4
+    if n <= max_points or columns < 1 or not np.all(x[1:] >= x[:-1]) or np.isnan(y).any():
+      return x, y
+    span = x[-1] - x[0]
+    if span == 0:
+      return x, y
+    cols = np.minimum(((x - x[0]) / span * columns).astype(np.int64), columns - 1)
+    starts = np.r_[0, np.flatnonzero(cols[1:] != cols[:-1]) + 1]
+    ends = np.r_[starts[1:], n]
+    counts = ends - starts
+    positions = np.arange(n)
+    mins = np.repeat(np.minimum.reduceat(y, starts), counts)
+    maxes = np.repeat(np.maximum.reduceat(y, starts), counts)
+    arg_mins = np.minimum.reduceat(np.where(y == mins, positions, n), starts)
+    arg_maxes = np.minimum.reduceat(np.where(y == maxes, positions, n), starts)
+    keep = np.unique(np.concatenate([starts, ends - 1, arg_mins, arg_maxes]))
+    return x[keep], y[keep]
+  def plot(self, ax):
     if len(self.x) == len(self.y):
-      plt.plot(self.x, self.y)
-      self.debug.prn(self, 'Sketch drawn.')
+      x, y = self.get_decimated()
+      ax.plot(x, y)
+      self.debug.prn(self, f'Sketch drawn with {len(x)} of {len(self.x)} points.')
     else:
       self.debug.prn(self, f'x({len(self.x)}) and y({len(self.y)}) must be of same length.', 1)
 
@@ -141,8 +293,8 @@ class HistogramSketch(Sketch):
     self.debug.prn(self, 'Bins set.')
   def get_bins(self):
     return self.bins
-  def plot(self):
-    plt.hist(self.x, self.bins)
+  def plot(self, ax):
+    ax.hist(self.get_x(), self.bins)
     self.debug.prn(self, 'Sketch drawn.')
 
 class HorizontalLineSketch(Sketch):
@@ -155,7 +307,8 @@ class HorizontalLineSketch(Sketch):
   def add_y(self, y):
     self.debug.prn(self, 'Use set_y() for HorizontalLineSketch.', 1)
   def set_y(self, y):
-    self.y = y
+    self.y = Buffer()
+    self.y.extend(y)
     self.debug.prn(self, 'Y set.')
   def add_x(self):
     self.debug.prn(self, 'Use set_x_max() and set_x_min() for HorizontalLineSketch.', 1)
@@ -171,9 +324,9 @@ class HorizontalLineSketch(Sketch):
     return self.x_max
   def get_x_min(self):
     return self.x_min
-  def plot(self):
-    if not (self.y == [] or self.x_max == None or self.x_min == None):
-      plt.hlines(self.y, self.x_max, self.x_min)
+  def plot(self, ax):
+    if not (len(self.y) == 0 or self.x_max == None or self.x_min == None):
+      ax.hlines(self.get_y(), self.x_max, self.x_min)
       self.debug.prn(self, 'Sketch drawn.')
     else:
       self.debug.prn(self, 'Y, x_max, or x_min not defined.', 1)
@@ -188,7 +341,8 @@ class VerticalLineSketch(Sketch):
   def add_x(self, x):
     self.debug.prn(self, 'Use set_x() for VerticalLineSketch.', 1)
   def set_x(self, x):
-    self.x = x
+    self.x = Buffer()
+    self.x.extend(x)
     self.debug.prn(self, 'X set.')
   def add_y(self):
     self.debug.prn(self, 'Use set_y_max() and set_y_min() for VerticalLineSketch.', 1)
@@ -204,9 +358,33 @@ class VerticalLineSketch(Sketch):
     return self.y_max
   def get_y_min(self):
     return self.y_min
-  def plot(self):
-    if not (self.x == [] or self.y_max == None or self.y_min == None):
-      plt.vlines(self.x, self.y_max, self.y_min)
+  def plot(self, ax):
+    if not (len(self.x) == 0 or self.y_max == None or self.y_min == None):
+      ax.vlines(self.get_x(), self.y_max, self.y_min)
       self.debug.prn(self, 'Sketch drawn.')
     else:
       self.debug.prn(self, 'X, y_max, or y_min not defined.', 1)
+
+class ResidualSketch(Sketch):
+  # All residual segments from fitted to observed y as one LineCollection.
+  def __init__(self):
+    super().__init__()
+    self.fitted = Buffer()
+  def class_name(self):
+    return 'ResidualSketch'
+  def add_fitted(self, fitted):
+    self._extend(self.fitted, fitted, 'fitted')
+  def get_fitted(self):
+    return self.fitted.get()
+  def plot(self, ax):
+    if len(self.x) == len(self.y) == len(self.fitted):
+      x = self.get_x()
+      segments = np.empty((len(x), 2, 2))
+      segments[:, :, 0] = x[:, None]
+      segments[:, 0, 1] = self.get_fitted()
+      segments[:, 1, 1] = self.get_y()
+      ax.add_collection(LineCollection(segments))
+      ax.autoscale_view()
+      self.debug.prn(self, 'Sketch drawn.')
+    else:
+      self.debug.prn(self, f'x({len(self.x)}), y({len(self.y)}) and fitted({len(self.fitted)}) must be of same length.', 1)